@@ -0,0 +1,235 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from log_sink import LogSink
+from process_driver import run_process
+from scheduler import TranscriptionScheduler, DONE
+from segments import SrtWriter, parse_segment_line
+
+from bench_segments import make_lines
+
+# Benchmarks liver's own overhead around Faster-Whisper, using fake_whisper.py
+# in place of the real executable. Prints one JSON document; with --baseline
+# it also lists every metric that got worse than the baseline by more than
+# --tolerance and exits 1 if there are any.
+FAKE_WHISPER = os.path.join(BENCH_DIR, 'fake_whisper.py')
+
+
+def fake_whisper_command(segments, stderr_lines=0, rate=0, startup=0):
+    return [sys.executable, FAKE_WHISPER, '--segments', str(segments), '--stderr-lines', str(stderr_lines),
+            '--rate', str(rate), '--startup', str(startup)]
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_parse(lines, repeat):
+    def run():
+        for line in lines:
+            parse_segment_line(line)
+    return {'lines_per_sec': round(len(lines) / best_of(run, repeat))}
+
+
+def bench_srt_write(lines, tmp_dir, repeat):
+    segments = [parse_segment_line(line) for line in lines]
+    path = os.path.join(tmp_dir, 'write.srt')
+
+    def run():
+        with SrtWriter(path) as writer:
+            for segment in segments:
+                writer.write(segment)
+    elapsed = best_of(run, repeat)
+    return {'segments_per_sec': round(len(segments) / elapsed), 'us_per_segment': round(elapsed / len(segments) * 1e6, 3)}
+
+
+def bench_log_sink(producers, messages, tick_ms):
+    # Worker threads log as fast as they can while a UI-like loop drains the
+    # sink every tick; latency is from write() to the drain that returned it.
+    # Scrollback large enough that no line is dropped before it is measured
+    sink = LogSink(max_lines=producers * messages)
+
+    def produce(worker):
+        for i in range(messages):
+            sink.write(f"{time.perf_counter()!r} worker {worker} line {i}\n")
+
+    threads = [threading.Thread(target=produce, args=(worker,)) for worker in range(producers)]
+    for thread in threads:
+        thread.start()
+
+    latencies = []
+    drain_costs = []
+    while len(latencies) < producers * messages:
+        time.sleep(tick_ms / 1000)
+        started = time.perf_counter()
+        text = sink.drain(max_records=producers * messages)
+        drained = time.perf_counter()
+        drain_costs.append((drained - started) * 1000)
+        for line in text.splitlines():
+            latencies.append((drained - float(line.split(' ', 1)[0])) * 1000)
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'messages': producers * messages,
+        'latency_p50_ms': round(statistics.median(latencies), 3),
+        'latency_p99_ms': round(latencies[int(len(latencies) * 0.99) - 1], 3),
+        'drain_max_ms': round(max(drain_costs), 3),
+    }
+
+
+def bench_driver(segments, stderr_lines, repeat):
+    # Pipe throughput of run_process against a child that floods both pipes
+    counted = []
+
+    def run():
+        lines = []
+        result = run_process(fake_whisper_command(segments, stderr_lines) + ['input.wav'], lines.append)
+        assert result.returncode == 0, result.stderr_tail
+        counted.append(len(lines))
+    elapsed = best_of(run, repeat)
+    return {'segments': counted[-1], 'stderr_lines': segments * stderr_lines, 'lines_per_sec': round(segments / elapsed)}
+
+
+def bench_end_to_end(files, workers, segments, stderr_lines, tmp_dir):
+    # Queue throughput through TranscriptionScheduler and SubtitleTranscriber,
+    # compared with running the same fake processes bare
+    try:
+        from liver import SubtitleTranscriber
+    except ImportError as e:
+        return {'skipped': f"cannot import liver: {str(e)}"}
+
+    command = fake_whisper_command(segments, stderr_lines)
+    audio_dir = os.path.join(tmp_dir, 'e2e')
+    os.makedirs(audio_dir)
+    audio_files = []
+    for i in range(files):
+        audio_file = os.path.join(audio_dir, f'file{i}.wav')
+        open(audio_file, 'wb').close()
+        audio_files.append(audio_file)
+
+    def run_bare(audio_file):
+        subprocess.run(command + [audio_file], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as executor:
+        list(executor.map(run_bare, audio_files))
+    bare = time.perf_counter() - started
+
+    def create_transcriber():
+        return SubtitleTranscriber(cache=None, resume=False, executable=command)
+
+    scheduler = TranscriptionScheduler(create_transcriber, workers=workers, log_callback=lambda message: None)
+    started = time.perf_counter()
+    # clean_srt reports on stdout; keep it out of the JSON
+    with contextlib.redirect_stdout(io.StringIO()):
+        for audio_file in audio_files:
+            scheduler.submit(audio_file, 'yue', '5', 'large-v3')
+        scheduler.wait()
+    elapsed = time.perf_counter() - started
+
+    statuses = scheduler.snapshot()
+    return {
+        'files': files,
+        'workers': workers,
+        'failed': sum(1 for status in statuses.values() if status != DONE),
+        'files_per_sec': round(files / elapsed, 3),
+        'segments_per_sec': round(files * segments / elapsed),
+        'overhead_per_file_ms': round((elapsed - bare) * workers / files * 1000, 1),
+    }
+
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)):
+            flat[f'{prefix}{key}'] = value
+    return flat
+
+
+def find_regressions(results, baseline, tolerance):
+    # Rates should not drop, times should not grow
+    regressions = []
+    current = flatten(results)
+    for key, old in flatten(baseline).items():
+        new = current.get(key)
+        if new is None or not old:
+            continue
+        if key.endswith('_per_sec') and new < old * (1 - tolerance):
+            regressions.append({'metric': key, 'baseline': old, 'current': new})
+        elif key.endswith('_ms') and new > old * (1 + tolerance):
+            regressions.append({'metric': key, 'baseline': old, 'current': new})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark liver's overhead around Faster-Whisper with a fake emitter")
+    parser.add_argument('--lines', type=int, default=100000, help="Segment lines for the parse and write benchmarks")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--producers', type=int, default=4, help="Threads writing to the log sink")
+    parser.add_argument('--messages', type=int, default=20000, help="Log lines per producer")
+    parser.add_argument('--tick-ms', type=float, default=100, help="UI drain interval")
+    parser.add_argument('--segments', type=int, default=5000, help="Segments per fake Faster-Whisper run")
+    parser.add_argument('--stderr-lines', type=int, default=2, help="stderr noise lines per segment")
+    parser.add_argument('--files', type=int, default=8, help="Files for the end-to-end benchmark")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--only', nargs='*', choices=['parse', 'srt_write', 'log_sink', 'driver', 'end_to_end'])
+    parser.add_argument('--output', default=None, help="Also write the results to this file")
+    parser.add_argument('--baseline', default=None, help="Earlier results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+
+    selected = set(args.only or ['parse', 'srt_write', 'log_sink', 'driver', 'end_to_end'])
+    lines = make_lines(args.lines)
+    results = {'python': sys.version.split()[0], 'platform': sys.platform}
+    with tempfile.TemporaryDirectory(prefix='liver-bench-') as tmp_dir:
+        if 'parse' in selected:
+            results['parse'] = bench_parse(lines, args.repeat)
+        if 'srt_write' in selected:
+            results['srt_write'] = bench_srt_write(lines, tmp_dir, args.repeat)
+        if 'log_sink' in selected:
+            results['log_sink'] = bench_log_sink(args.producers, args.messages, args.tick_ms)
+        if 'driver' in selected:
+            results['driver'] = bench_driver(args.segments, args.stderr_lines, args.repeat)
+        if 'end_to_end' in selected:
+            results['end_to_end'] = bench_end_to_end(args.files, args.workers, args.segments, args.stderr_lines, tmp_dir)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        results['regressions'] = find_regressions(results, baseline, args.tolerance)
+        exit_code = 1 if results['regressions'] else 0
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
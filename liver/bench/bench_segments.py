@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segments import SrtWriter, parse_segment_line, format_srt_timestamp
+
+# The per-line path liver used before segments.py, kept here as the baseline
+LEGACY_REGEX = re.compile(r'^\[(\d+):(\d{2}\.\d{3}) --> (\d+):(\d{2}\.\d{3})\] (.+)$')
+
+
+def legacy_format_timestamp_from_match(minutes, sec_mili):
+    total_seconds = float(minutes) * 60 + float(sec_mili)
+    secint = int(total_seconds)
+    milliseconds = int((total_seconds - secint) * 1000)
+    hours, minutes = divmod(secint, 3600)
+    minutes, seconds = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02},{milliseconds:03}"
+
+
+def make_lines(count):
+    lines = []
+    for i in range(count):
+        start = i * 2345
+        end = start + 2000
+        lines.append(f"[{start // 60000:02}:{start // 1000 % 60:02}.{start % 1000:03} --> "
+                     f"{end // 60000:02}:{end // 1000 % 60:02}.{end % 1000:03}] 呢個係第{i}句字幕\n")
+    return lines
+
+
+def run_legacy(lines, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        segment_index = 1
+        for line in lines:
+            match = LEGACY_REGEX.match(line)
+            if match:
+                m1, s1, m2, s2, text = match.groups()
+                start_time = legacy_format_timestamp_from_match(m1, s1)
+                end_time = legacy_format_timestamp_from_match(m2, s2)
+                f.write(f"{segment_index}\n{start_time} --> {end_time}\n{text.strip()}\n\n")
+                f.flush()
+                segment_index += 1
+
+
+def run_current(lines, path):
+    with SrtWriter(path) as writer:
+        for line in lines:
+            segment = parse_segment_line(line)
+            if segment:
+                writer.write(segment)
+
+
+def count_millisecond_errors(lines):
+    errors = 0
+    for line in lines:
+        m1, s1, _, _, _ = LEGACY_REGEX.match(line).groups()
+        segment = parse_segment_line(line)
+        if legacy_format_timestamp_from_match(m1, s1) != format_srt_timestamp(segment.start_ms):
+            errors += 1
+    return errors
+
+
+def measure(func, lines, path, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(lines, path)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(lines) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark for the Faster-Whisper segment parser and SRT writer")
+    parser.add_argument('--lines', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    lines = make_lines(args.lines)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bench.srt')
+        legacy = measure(run_legacy, lines, path, args.repeat)
+        current = measure(run_current, lines, path, args.repeat)
+
+    print(json.dumps({
+        'lines': args.lines,
+        'legacy_lines_per_sec': round(legacy),
+        'current_lines_per_sec': round(current),
+        'speedup': round(current / legacy, 2),
+        'legacy_millisecond_errors': count_millisecond_errors(lines),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import (DEFAULT_SEARCH_WINDOW_MS, MIN_CHUNK_FRACTION, SEARCH_WINDOW_FRACTION, plan_chunks,
+                      transcribe_in_chunks)
+from media import detect_silences, probe_duration_ms
+from segments import Segment
+
+# Runs the chunked path end to end on generated audio, with a fake in place
+# of Faster-Whisper: a tone that falls silent for a second at the end of
+# every target length, cut by plan_chunks at those silences, extracted by
+# ffmpeg and "transcribed" by a callable that returns segments at known
+# chunk-relative times, including one that runs past the end of its chunk
+# and one that starts after it.
+# Checks the short last chunk is merged, offsets are applied when stitching
+# and nothing overlaps or repeats at the boundaries. Prints one JSON
+# document and exits 1 if any check fails. Needs ffmpeg and ffprobe.
+
+CHUNK_NAME_REGEX = re.compile(r'chunk(\d+)\.wav$')
+
+SEGMENT_STEP_MS = 2000
+SEGMENT_MS = 1500
+
+# Extracted chunks may differ from the plan by a few frames
+LENGTH_TOLERANCE_MS = 50
+
+
+def make_audio(path, duration_s, period_s):
+    # A tone silent for the last second of every period; commas inside a
+    # filter option have to be escaped
+    expression = rf'if(lt(mod(t\,{period_s})\,{period_s - 1})\,0.5*sin(2*PI*440*t)\,0)'
+    command = ['ffmpeg', '-hide_banner', '-nostats', '-loglevel', 'error', '-y',
+               '-f', 'lavfi', '-i', f'aevalsrc={expression}:s=16000:d={duration_s}', path]
+    subprocess.run(command, check=True, capture_output=True)
+
+
+def fake_segments(length_ms, index):
+    # Evenly spaced segments that end well before the chunk does, then one
+    # the model ran past the end with and one placed after the end
+    segments = [Segment(t, t + SEGMENT_MS, f"chunk{index} {t}")
+                for t in range(0, length_ms - 1000 - SEGMENT_MS, SEGMENT_STEP_MS)]
+    segments.append(Segment(length_ms - 1000, length_ms + 1000, f"chunk{index} overrun"))
+    segments.append(Segment(length_ms + 500, length_ms + 900, f"chunk{index} past end"))
+    return segments
+
+
+def expected_segments(chunks):
+    expected = []
+    for index, (start_ms, end_ms) in enumerate(chunks):
+        for segment in fake_segments(end_ms - start_ms, index):
+            if start_ms + segment.start_ms < end_ms:
+                expected.append(Segment(start_ms + segment.start_ms, min(start_ms + segment.end_ms, end_ms), segment.text))
+    return expected
+
+
+def check(name, ok, detail=None):
+    result = {'check': name, 'ok': bool(ok)}
+    if detail is not None:
+        result['detail'] = detail
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check liver's chunked transcription with a fake transcriber")
+    # The defaults leave about 20 s after the last cut, short enough to merge
+    parser.add_argument('--duration', type=int, default=200, help="Seconds of generated audio")
+    parser.add_argument('--target', type=int, default=60, help="Target chunk length in seconds")
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    target_ms = args.target * 1000
+    checks = []
+    with tempfile.TemporaryDirectory(prefix='liver-check-') as tmp_dir:
+        audio_file = os.path.join(tmp_dir, 'source.wav')
+        make_audio(audio_file, args.duration, args.target)
+        duration_ms = probe_duration_ms(audio_file)
+        chunks = plan_chunks(duration_ms, detect_silences(audio_file), target_ms)
+
+        # Left alone, the last chunk is never longer than the target plus the
+        # search window; only merging the short one into it makes it longer
+        search_window_ms = min(DEFAULT_SEARCH_WINDOW_MS, int(target_ms * SEARCH_WINDOW_FRACTION))
+        merged = len(chunks) > 1 and chunks[-1][1] - chunks[-1][0] > target_ms + search_window_ms
+        checks.append(check('last_chunk_merged', merged, chunks))
+        checks.append(check('no_short_chunk',
+                            all(end - start >= target_ms * MIN_CHUNK_FRACTION for start, end in chunks)))
+
+        lengths = {}
+
+        def transcribe_chunk(chunk_path):
+            index = int(CHUNK_NAME_REGEX.search(chunk_path).group(1))
+            with wave.open(chunk_path, 'rb') as wav:
+                lengths[index] = wav.getnframes() * 1000 // wav.getframerate()
+            start_ms, end_ms = chunks[index]
+            return fake_segments(end_ms - start_ms, index)
+
+        stitched = transcribe_in_chunks(audio_file, chunks, transcribe_chunk, tmp_dir, workers=args.workers)
+
+    stitched = stitched or []
+    planned = {index: end - start for index, (start, end) in enumerate(chunks)}
+    checks.append(check('chunks_extracted',
+                        len(lengths) == len(chunks) and all(abs(lengths[index] - planned[index]) <= LENGTH_TOLERANCE_MS
+                                                            for index in lengths),
+                        {'planned_ms': planned, 'extracted_ms': lengths}))
+    checks.append(check('offsets_applied', stitched == expected_segments(chunks)))
+    overlaps = [(a.text, b.text) for a, b in zip(stitched, stitched[1:]) if b.start_ms < a.end_ms]
+    checks.append(check('no_overlap', not overlaps, overlaps or None))
+    checks.append(check('no_duplicates', len({segment.text for segment in stitched}) == len(stitched)))
+    checks.append(check('within_file', all(0 <= s.start_ms <= s.end_ms <= duration_ms for s in stitched)))
+    checks.append(check('overruns_clamped', all(s.end_ms == end for s, (_, end) in
+                                                zip([s for s in stitched if s.text.endswith('overrun')], chunks))))
+    checks.append(check('past_end_dropped', not any(s.text.endswith('past end') for s in stitched)))
+
+    failed = [result['check'] for result in checks if not result['ok']]
+    print(json.dumps({'duration_ms': duration_ms, 'chunks': len(chunks), 'segments': len(stitched),
+                      'checks': checks, 'failed': failed}, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
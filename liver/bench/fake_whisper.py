@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+import time
+
+# Stand-in for Faster-Whisper-XXL.exe: accepts the same command line, prints
+# "[mm:ss.mmm --> mm:ss.mmm] text" segment lines on stdout at a configurable
+# rate, optionally floods stderr the way CUDA/ctranslate2 warnings do, and
+# writes <output_dir>/<input name>.srt at the end. The options below go
+# before the input file, e.g.
+#   python fake_whisper.py --segments 5000 --rate 0 --stderr-lines 2 input.wav --output_dir out ...
+
+
+def format_timestamp(ms):
+    return '%02d:%02d.%03d' % (ms // 60000, ms // 1000 % 60, ms % 1000)
+
+
+def format_srt_timestamp(ms):
+    return '%02d:%02d:%02d,%03d' % (ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Faster-Whisper for benchmarks")
+    parser.add_argument('input')
+    parser.add_argument('--segments', type=int, default=1000)
+    parser.add_argument('--segment-ms', type=int, default=2345)
+    parser.add_argument('--rate', type=float, default=0, help="Segments per second (0 = as fast as possible)")
+    parser.add_argument('--startup', type=float, default=0, help="Seconds before the first segment, like a model load")
+    parser.add_argument('--stderr-lines', type=int, default=0, help="Noise lines on stderr per segment")
+    parser.add_argument('--text', default='呢個係第{i}句字幕')
+    parser.add_argument('--exit-code', type=int, default=0)
+    parser.add_argument('--output_dir', default=None)
+    parser.add_argument('--output_format', default='srt')
+    # Everything else Faster-Whisper accepts (--model, --beam_size, ...) is ignored
+    args, _ = parser.parse_known_args(argv)
+
+    # Faster-Whisper writes UTF-8 whatever the console code page is
+    sys.stdout.reconfigure(encoding='utf-8')
+    out = sys.stdout
+    err = sys.stderr
+    time.sleep(args.startup)
+    started = time.monotonic()
+    srt_blocks = []
+    for i in range(args.segments):
+        if args.rate:
+            delay = started + i / args.rate - time.monotonic()
+            if delay > 0:
+                out.flush()
+                time.sleep(delay)
+        start = i * args.segment_ms
+        end = start + args.segment_ms - 300
+        text = args.text.format(i=i)
+        out.write(f"[{format_timestamp(start)} --> {format_timestamp(end)}] {text}\n")
+        for j in range(args.stderr_lines):
+            err.write(f"[W ctranslate2] warning {i}.{j}: the compute type inferred from the saved model is float16\n")
+        srt_blocks.append(f"{i + 1}\n{format_srt_timestamp(start)} --> {format_srt_timestamp(end)}\n{text}\n\n")
+    out.flush()
+    err.flush()
+
+    if args.output_dir and args.exit_code == 0:
+        name = os.path.splitext(os.path.basename(args.input))[0]
+        with open(os.path.join(args.output_dir, f"{name}.srt"), 'w', encoding='utf-8') as f:
+            f.write(''.join(srt_blocks))
+    return args.exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
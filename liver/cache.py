@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached output format or the fixed Faster-Whisper flags change
+CACHE_VERSION = 2
+
+# The media hash reads a few fixed-size samples instead of the whole file
+HASH_SAMPLE_SIZE = 4 << 20
+HASH_SAMPLES = 8
+
+DEFAULT_CACHE_SIZE = 2 << 30
+
+
+def default_cache_dir(name='transcripts'):
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'liver', name)
+
+
+def media_hash(file_path):
+    # Size plus evenly spaced samples (always including the head and tail) is
+    # enough to tell recordings apart and costs the same for a 50 MB clip as
+    # for a 20 GB stream.
+    size = os.path.getsize(file_path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=20)
+    with open(file_path, 'rb') as f:
+        if size <= HASH_SAMPLE_SIZE * HASH_SAMPLES:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        else:
+            step = (size - HASH_SAMPLE_SIZE) // (HASH_SAMPLES - 1)
+            for i in range(HASH_SAMPLES):
+                f.seek(i * step)
+                digest.update(f.read(HASH_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, audio_file, model, lang, beam_size, backend):
+        # backend names what transcribed it and with which options, so a
+        # server transcript is never reused for a local run or the reverse
+        params = f"v{CACHE_VERSION}|{backend}|{model}|{lang}|{beam_size}"
+        return hashlib.blake2b(f"{media_hash(audio_file)}|{params}".encode(), digest_size=20).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.srt")
+
+    def contains(self, key):
+        return os.path.exists(self.path(key))
+
+    def get(self, key, target_path):
+        # Materialize a cached transcript at target_path; returns False on a miss
+        cached = self.path(key)
+        if not os.path.exists(cached):
+            return False
+        copy_file_atomic(cached, target_path)
+        # mtime doubles as the last-used time for eviction
+        try:
+            os.utime(cached)
+        except OSError:
+            pass
+        return True
+
+    def put(self, key, srt_path):
+        copy_file_atomic(srt_path, self.path(key))
+        with self.lock:
+            evict_lru(self.cache_dir, '.srt', self.max_bytes)
+
+
+def copy_file_atomic(src, dst):
+    # Copy through a temp file next to dst, so dst is either old or complete
+    fd, tmp_path = tempfile.mkstemp(prefix='.liver-', suffix=os.path.splitext(dst)[1], dir=os.path.dirname(os.path.abspath(dst)))
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def evict_lru(directory, suffix, max_bytes):
+    # Drop the least recently used files (by mtime) until the rest fit in max_bytes.
+    # Dot-files are in-flight temp files and are left alone.
+    entries = []
+    total = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(suffix) and not entry.name.startswith('.'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            logger.warning("Could not evict %s", path)
@@ -0,0 +1,86 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from media import extract_audio
+from segments import Segment
+
+# How far around each target boundary to look for a silence to cut at; never
+# more than SEARCH_WINDOW_FRACTION of the target, so short targets stay short
+DEFAULT_SEARCH_WINDOW_MS = 60000
+SEARCH_WINDOW_FRACTION = 0.25
+
+# A last chunk shorter than this fraction of the target joins the one before
+MIN_CHUNK_FRACTION = 0.5
+
+
+def plan_chunks(duration_ms, silences, target_ms, search_window_ms=DEFAULT_SEARCH_WINDOW_MS):
+    # Split [0, duration_ms) into chunks of roughly target_ms. Each cut lands
+    # in the middle of the longest silence within the search window of the
+    # target boundary, or exactly on the boundary if there is none.
+    search_window_ms = min(search_window_ms, int(target_ms * SEARCH_WINDOW_FRACTION))
+    chunks = []
+    start = 0
+    while duration_ms - start > target_ms + search_window_ms:
+        target = start + target_ms
+        best = None
+        for silence_start, silence_end in silences:
+            middle = (silence_start + silence_end) // 2
+            if start < middle < duration_ms and abs(middle - target) <= search_window_ms:
+                if best is None or silence_end - silence_start > best[1] - best[0]:
+                    best = (silence_start, silence_end)
+        cut = (best[0] + best[1]) // 2 if best else target
+        chunks.append((start, cut))
+        start = cut
+    if chunks and duration_ms - start < target_ms * MIN_CHUNK_FRACTION:
+        start = chunks.pop()[0]
+    chunks.append((start, duration_ms))
+    return chunks
+
+
+def stitch_segments(chunk_results):
+    # chunk_results: [((start_ms, end_ms), [Segment, ...]), ...] with chunk-relative
+    # timestamps. Returns one list in file order with absolute timestamps.
+    # Segments the model placed past the end of their chunk are clamped to it.
+    stitched = []
+    for (chunk_start, chunk_end), segments in sorted(chunk_results, key=lambda result: result[0][0]):
+        for segment in segments:
+            start_ms = chunk_start + segment.start_ms
+            if start_ms >= chunk_end:
+                continue
+            end_ms = min(chunk_start + segment.end_ms, chunk_end)
+            stitched.append(Segment(start_ms, max(start_ms, end_ms), segment.text))
+    return stitched
+
+
+def transcribe_in_chunks(audio_file, chunks, transcribe_chunk, work_dir, workers=2, stop_flag=None):
+    # Extract every chunk with ffmpeg and run transcribe_chunk(chunk_path) on up
+    # to `workers` of them at once. transcribe_chunk returns the chunk's segments,
+    # or None if it failed; any failure or a set stop_flag aborts the whole file.
+    failed = threading.Event()
+
+    def run(index, chunk):
+        if failed.is_set() or (stop_flag is not None and stop_flag.is_set()):
+            return None
+        start_ms, end_ms = chunk
+        chunk_path = os.path.join(work_dir, f"chunk{index:04}.wav")
+        try:
+            extract_audio(audio_file, chunk_path, start_ms, end_ms - start_ms)
+            segments = transcribe_chunk(chunk_path)
+        except Exception:
+            failed.set()
+            raise
+        finally:
+            if os.path.exists(chunk_path):
+                os.remove(chunk_path)
+        if segments is None:
+            failed.set()
+        return segments
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(run, index, chunk) for index, chunk in enumerate(chunks)]
+        results = [future.result() for future in futures]
+
+    if any(segments is None for segments in results):
+        return None
+    return stitch_segments(list(zip(chunks, results)))
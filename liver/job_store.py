@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import threading
+import time
+
+from cache import default_cache_dir
+
+# Job states. RETRYING jobs failed and wait for next_attempt_at before they
+# run again; DONE, FAILED and STOPPED are final.
+QUEUED = 'queued'
+RUNNING = 'running'
+RETRYING = 'retrying'
+DONE = 'done'
+FAILED = 'failed'
+STOPPED = 'stopped'
+
+PENDING_STATES = (QUEUED, RETRYING)
+ACTIVE_STATES = (QUEUED, RETRYING, RUNNING)
+
+DEFAULT_MAX_ATTEMPTS = 3
+# Backoff after the n-th failed attempt: RETRY_DELAY * 2 ** (n - 1), capped
+DEFAULT_RETRY_DELAY = 30.0
+MAX_RETRY_DELAY = 600.0
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    audio_file TEXT NOT NULL UNIQUE,
+    lang TEXT NOT NULL,
+    beam_size TEXT NOT NULL,
+    model TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (state, priority DESC, id);
+'''
+
+
+def default_store_path():
+    return os.path.join(default_cache_dir('jobs'), 'jobs.sqlite3')
+
+
+class TranscriptionJob:
+    def __init__(self, id, audio_file, lang, beam_size, model, priority=0, attempts=0):
+        self.id = id
+        self.audio_file = audio_file
+        self.lang = lang
+        self.beam_size = beam_size
+        self.model = model
+        self.priority = priority
+        self.attempts = attempts
+
+
+class JobStore:
+    # Durable transcription queue. Every state change is committed before it
+    # is acted on, so after a crash recover() puts interrupted jobs back in the
+    # queue and nothing is lost or run twice. Safe to share between threads;
+    # path ':memory:' gives a throwaway store.
+    def __init__(self, path=None, max_attempts=DEFAULT_MAX_ATTEMPTS, retry_delay=DEFAULT_RETRY_DELAY):
+        self.path = path or default_store_path()
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+
+    def add(self, audio_file, lang, beam_size, model, priority=0):
+        # Queues audio_file, or updates the settings of a job that is still
+        # waiting. Finished jobs start over with a fresh attempt count. Returns
+        # False if the file is running right now.
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute('SELECT state FROM jobs WHERE audio_file = ?', (audio_file,)).fetchone()
+            if row is None:
+                self.conn.execute(
+                    'INSERT INTO jobs (audio_file, lang, beam_size, model, priority, state, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (audio_file, lang, str(beam_size), model, priority, QUEUED, now))
+            elif row['state'] == RUNNING:
+                return False
+            elif row['state'] in PENDING_STATES:
+                self.conn.execute(
+                    'UPDATE jobs SET lang = ?, beam_size = ?, model = ?, priority = ?, updated_at = ? WHERE audio_file = ?',
+                    (lang, str(beam_size), model, priority, now, audio_file))
+            else:
+                self.conn.execute(
+                    'UPDATE jobs SET lang = ?, beam_size = ?, model = ?, priority = ?, state = ?, attempts = 0, '
+                    'next_attempt_at = 0, last_error = NULL, updated_at = ? WHERE audio_file = ?',
+                    (lang, str(beam_size), model, priority, QUEUED, now, audio_file))
+        return True
+
+    def claim(self):
+        # Marks the highest-priority due job as running and returns it, or None
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                'SELECT * FROM jobs WHERE state IN (?, ?) AND next_attempt_at <= ? ORDER BY priority DESC, id LIMIT 1',
+                (*PENDING_STATES, now)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                'UPDATE jobs SET state = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?',
+                (RUNNING, now, row['id']))
+        return TranscriptionJob(row['id'], row['audio_file'], row['lang'], row['beam_size'], row['model'], row['priority'], row['attempts'] + 1)
+
+    def finish(self, job, state, error=None):
+        # Records the outcome of a claimed job. A FAILED job with attempts left
+        # becomes RETRYING after a backoff. Returns the state actually stored.
+        now = time.time()
+        next_attempt_at = 0
+        if state == FAILED and job.attempts < self.max_attempts:
+            state = RETRYING
+            next_attempt_at = now + self.backoff(job.attempts)
+        with self.lock, self.conn:
+            self.conn.execute(
+                'UPDATE jobs SET state = ?, next_attempt_at = ?, last_error = ?, updated_at = ? WHERE id = ?',
+                (state, next_attempt_at, error, now, job.id))
+        return state
+
+    def backoff(self, attempts):
+        return min(MAX_RETRY_DELAY, self.retry_delay * 2 ** (attempts - 1))
+
+    def recover(self):
+        # Jobs left RUNNING by a crash go back to the queue; their attempt
+        # still counts, so a file that keeps crashing the app ends up FAILED.
+        now = time.time()
+        with self.lock, self.conn:
+            rows = self.conn.execute('SELECT audio_file, attempts FROM jobs WHERE state = ?', (RUNNING,)).fetchall()
+            self.conn.execute(
+                'UPDATE jobs SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, '
+                "last_error = COALESCE(last_error, 'interrupted'), updated_at = ? WHERE state = ?",
+                (self.max_attempts, FAILED, QUEUED, now, RUNNING))
+        return [row['audio_file'] for row in rows if row['attempts'] < self.max_attempts]
+
+    def stop_pending(self):
+        # Marks every waiting job STOPPED and returns their files
+        now = time.time()
+        with self.lock, self.conn:
+            rows = self.conn.execute('SELECT audio_file FROM jobs WHERE state IN (?, ?)', PENDING_STATES).fetchall()
+            self.conn.execute('UPDATE jobs SET state = ?, updated_at = ? WHERE state IN (?, ?)', (STOPPED, now, *PENDING_STATES))
+        return [row['audio_file'] for row in rows]
+
+    def remove(self, audio_file):
+        with self.lock, self.conn:
+            cursor = self.conn.execute('DELETE FROM jobs WHERE audio_file = ? AND state != ?', (audio_file, RUNNING))
+        return cursor.rowcount > 0
+
+    def clear_finished(self):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM jobs WHERE state NOT IN (?, ?, ?)', ACTIVE_STATES)
+
+    def set_priority(self, audio_file, priority):
+        with self.lock, self.conn:
+            self.conn.execute('UPDATE jobs SET priority = ? WHERE audio_file = ?', (priority, audio_file))
+
+    def max_priority(self):
+        with self.lock:
+            return self.conn.execute('SELECT COALESCE(MAX(priority), 0) FROM jobs').fetchone()[0]
+
+    def states(self):
+        # {audio_file: state} in queue order
+        with self.lock:
+            rows = self.conn.execute('SELECT audio_file, state FROM jobs ORDER BY priority DESC, id').fetchall()
+        return {row['audio_file']: row['state'] for row in rows}
+
+    def pending(self):
+        # Files still to run, in the order they will run
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT audio_file FROM jobs WHERE state IN (?, ?) ORDER BY priority DESC, id', PENDING_STATES).fetchall()
+        return [row['audio_file'] for row in rows]
+
+    def pending_jobs(self):
+        # Waiting jobs in the order claim() will hand them out: those due now
+        # first, then by priority and due time
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT * FROM jobs WHERE state IN (?, ?) ORDER BY next_attempt_at > ?, priority DESC, next_attempt_at, id',
+                (*PENDING_STATES, time.time())).fetchall()
+        return [TranscriptionJob(row['id'], row['audio_file'], row['lang'], row['beam_size'], row['model'], row['priority'], row['attempts']) for row in rows]
+
+    def next_due(self):
+        # Seconds until the next waiting job may run: 0 if one is due now,
+        # None if nothing is waiting
+        with self.lock:
+            row = self.conn.execute('SELECT MIN(next_attempt_at) FROM jobs WHERE state IN (?, ?)', PENDING_STATES).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
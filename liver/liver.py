@@ -1,136 +1,392 @@
 import logging
 import os
+import queue
 import threading
-import subprocess
 import re
-from datetime import timedelta
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import customtkinter as ctk
-import codecs
+import tempfile
 import sys
+import argparse
+from scheduler import TranscriptionScheduler, RUNNING, DONE, FAILED, ACTIVE_STATES
+from job_store import JobStore, DEFAULT_MAX_ATTEMPTS
+from segments import SrtWriter, parse_segment_line, format_srt_timestamp, read_complete_segments
+from cache import TranscriptionCache, DEFAULT_CACHE_SIZE, copy_file_atomic
+from media import MEDIA_EXTENSIONS, probe_duration_ms, detect_silences, extract_audio
+from chunking import plan_chunks, transcribe_in_chunks
+from log_sink import LogSink
+from process_driver import run_process, ProgressTracker
+from prefetch import AudioPrefetcher, DEFAULT_LOOKAHEAD, DEFAULT_PREFETCH_SIZE
+from telemetry import JobTelemetry, TelemetryLog
+from watcher import FolderWatcher, DEFAULT_SCAN_INTERVAL, DEFAULT_SETTLE_SECONDS
+import whisper_server
+from whisper_server import TranscriptionServerClient, BACKENDS, DEFAULT_ADDRESS, parse_address
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Regular expression to match subtitle lines
-SUBTITLE_REGEX = re.compile(r'^\[(\d+):(\d{2}\.\d{3}) --> (\d+):(\d{2}\.\d{3})\] (.+)$')
-
-
-def clean_srt(file_path):
+# How often the UI drains queued log records into the log view
+LOG_FLUSH_INTERVAL_MS = 100
+
+
+# Characters kept by clean_srt: newline, printable ASCII and the CJK, kana and hangul blocks
+CLEAN_SRT_RANGES = [
+    (0x0a, 0x0a), (0x20, 0x7e), (0x1100, 0x11ff), (0x3040, 0x309f), (0x30a0, 0x30ff),
+    (0x3130, 0x318f), (0x4e00, 0x9fff), (0xa960, 0xa97f), (0xac00, 0xd7af), (0xff00, 0xffef),
+]
+
+# UTF-8 punctuation that was decoded as cp1252, mapped to characters clean_srt keeps
+MOJIBAKE_REPLACEMENTS = {'â€™': "'", 'â€"': "-", 'â€œ': '"', 'â€': '"'}
+MOJIBAKE_REGEX = re.compile('â€[™"œ]?')
+
+# Everything outside CLEAN_SRT_RANGES, compiled once into a single character class
+CLEAN_SRT_REGEX = re.compile('[^%s]' % ''.join(f'\\u{low:04x}-\\u{high:04x}' for low, high in CLEAN_SRT_RANGES))
+
+CLEAN_SRT_CHUNK_SIZE = 1 << 20
+
+
+def repair_mojibake(match):
+    return MOJIBAKE_REPLACEMENTS[match.group()]
+
+def clean_srt_chunk(text):
+    # The mojibake pattern only runs on the rare chunks that can contain it
+    if 'â' in text:
+        text = MOJIBAKE_REGEX.sub(repair_mojibake, text)
+    return CLEAN_SRT_REGEX.sub('', text)
+
+def clean_srt_stream(file_path, encoding, out, chunk_size):
+    carry = ''
+    with open(file_path, 'r', encoding=encoding, newline='') as src:
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            text = carry + chunk
+            # Hold back a mojibake sequence that may continue in the next chunk
+            cut = len(text)
+            if text.endswith('â€'):
+                cut -= 2
+            elif text.endswith('â'):
+                cut -= 1
+            carry = text[cut:]
+            out.write(clean_srt_chunk(text[:cut]))
+    out.write(clean_srt_chunk(carry))
+
+def clean_srt(file_path, chunk_size=CLEAN_SRT_CHUNK_SIZE):
+    # Stream the cleaned text into a temp file next to the original and swap it
+    # in atomically, so a crash can never leave a truncated transcript behind.
+    fd, tmp_path = tempfile.mkstemp(prefix='.clean-', suffix='.srt', dir=os.path.dirname(os.path.abspath(file_path)))
     try:
-        with codecs.open(file_path, 'r', encoding='utf-8-sig') as file:
-            content = file.read()
-    except UnicodeDecodeError:
-        with codecs.open(file_path, 'r', encoding='iso-8859-1') as file:
-            content = file.read()
-
-    # Remove BOM if present
-    content = content.lstrip('\ufeff')
-
-    # Remove non-printable characters except newlines and CJK characters
-    content = re.sub(r'[^\u4e00-\u9fff\u3040-\u309f\u30a0-\u30ff\uff00-\uffef\u1100-\u11ff\u3130-\u318f\ua960-\ua97f\uac00-\ud7af\u4e00-\u9fff\x20-\x7E\n]', '', content)
-
-    # Fix common encoding issues
-    content = content.replace('â€™', "'")
-    content = content.replace('â€"', "–")
-    content = content.replace('â€œ', '"')
-    content = content.replace('â€', '"')
-
-    with codecs.open(file_path, 'w', encoding='utf-8') as file:
-        file.write(content)
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as out:
+            try:
+                clean_srt_stream(file_path, 'utf-8-sig', out, chunk_size)
+            except UnicodeDecodeError:
+                out.seek(0)
+                out.truncate()
+                clean_srt_stream(file_path, 'iso-8859-1', out, chunk_size)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
     print(f"Cleaned SRT file has been saved as {file_path}")
 
-def format_timestamp(seconds):
-    delta = timedelta(seconds=seconds)
-    hours, remainder = divmod(delta.total_seconds(), 3600)
-    minutes, seconds = divmod(remainder, 60)
-    milliseconds = int((seconds - int(seconds)) * 1000)
-    return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02},{milliseconds:03}"
-
-def format_timestamp_from_match(minutes, sec_mili):
-    total_seconds = float(minutes) * 60 + float(sec_mili)
-    secint = int(total_seconds)
-    milliseconds = int((total_seconds - secint) * 1000)
-    hours, minutes = divmod(secint, 3600)
-    minutes, seconds = divmod(minutes, 60)
-    return f"{hours:02}:{minutes:02}:{seconds:02},{milliseconds:03}"
+FASTER_WHISPER_EXECUTABLE = ('Faster-Whisper-XXL.exe',)
+# Decoding options every local run passes; they are part of the cache key
+FASTER_WHISPER_OPTIONS = ('--best_of', '10', '--vad_filter', 'true', '--vad_alt_method', 'silero_v4', '--standard_asia')
+
+def backend_identity(server):
+    # What a transcript came from, for the cache key: the server's backend
+    # (raises OSError if it cannot be reached, RuntimeError without a key)
+    # or a local XXL process
+    if server:
+        return f"server|{server.backend_identity()}"
+    return f"xxl|{' '.join(FASTER_WHISPER_OPTIONS)}"
 
 class SubtitleTranscriber:
-    def __init__(self, model="large-v3", device="CUDA"):
+    # server: an optional TranscriptionServerClient; jobs then go to a warm model instead of a new process
+    # telemetry: an optional TelemetryLog that gets one record per transcribed file
+    # executable: the command that runs Faster-Whisper, as a list (e.g. a stand-in for benchmarks)
+    def __init__(self, model="large-v3", device="CUDA", threads=0, cache=None, chunk_minutes=0, chunk_workers=2, resume=True, server=None, telemetry=None,
+                 executable=FASTER_WHISPER_EXECUTABLE):
         self.model = model
+        self.executable = list(executable)
         self.device = device
+        self.threads = threads
+        self.cache = cache
+        self.chunk_minutes = chunk_minutes
+        self.chunk_workers = chunk_workers
+        self.resume = resume
+        self.server = server
+        self.telemetry = telemetry
+        self.job_telemetry = None
         self.stop_flag = threading.Event()
         self.thread = None
 
-    def transcribe_and_write_srt_live(self, audio_file, log_callback, lang, beam_size):
-        output_dir = os.path.dirname(audio_file)
-        base_name = os.path.splitext(os.path.basename(audio_file))[0]
-        cjk_srt_file = os.path.join(output_dir, f"{base_name}.srt")
-        cjk_tmp_srt_file = f"{output_dir}/{base_name}.{lang}.tmp.srt"
-
-        if os.path.exists(cjk_srt_file):
-            log_callback(f"Transcription completed. SRT file saved at {cjk_srt_file}\n")
-            return
-
+    def build_command(self, input_file, output_dir, lang, beam_size):
         command = [
-            'Faster-Whisper-XXL.exe', audio_file,
+            *self.executable, input_file,
             '--model', self.model,
             '--device', self.device,
             '--output_dir', output_dir,
             '--output_format', 'srt',
             '--task', 'transcribe',
             '--beam_size', str(beam_size),
-            '--best_of', "10",
             '--verbose', 'true',
-            '--vad_filter', 'true',
-            '--vad_alt_method', 'silero_v4',
-            '--standard_asia',
+            *FASTER_WHISPER_OPTIONS,
         ]
 
         # Add language parameter only if the model is not cantonese
         if self.model != "cantonese":
             command.extend(['--language', lang])
 
-        log_callback(f"Starting transcription for {audio_file}\n")
+        # Bound the CPU threads of each process so several workers can share the machine
+        if self.threads:
+            command.extend(['--threads', str(self.threads)])
+        return command
+
+    def run_whisper(self, input_file, output_dir, lang, beam_size, log_callback, on_segment):
+        # Transcribes input_file and hands every parsed segment to on_segment,
+        # either on the warm-model server or with a fresh Faster-Whisper
+        # process that also writes its SRT to output_dir. Returns False if it
+        # could not start, was stopped or failed.
+        telemetry = self.job_telemetry
+        if telemetry:
+            spawn_requested = telemetry.transcription_started()
+            on_segment = self.counting_segments(on_segment, telemetry)
+
+        if self.server:
+            return self.run_on_server(input_file, lang, beam_size, log_callback, on_segment)
+
+        command = self.build_command(input_file, output_dir, lang, beam_size)
         log_callback(f"Command: {' '.join(command)}\n")
 
-        if os.path.exists(cjk_srt_file):
-            log_callback(f"Transcription exist, file saved at {cjk_srt_file}\n")
-            return
+        def handle_line(line):
+            if '-->' in line:
+                log_callback(line)
+                segment = parse_segment_line(line)
+                if segment:
+                    on_segment(segment)
+
+        pids = []
+
+        def on_start(pid):
+            pids.append(pid)
+            telemetry.process_started(pid, spawn_requested)
 
         try:
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8')
+            result = run_process(command, handle_line, stop_flag=self.stop_flag, on_start=on_start if telemetry else None)
         except Exception as e:
             log_callback(f"Error starting transcription: {str(e)}\n")
-            return
+            return False
+        finally:
+            for pid in pids:
+                telemetry.process_finished(pid)
+
+        if result.stopped:
+            log_callback("Transcription stopped.\n")
+            return False
+        if result.returncode != 0:
+            log_callback(f"Faster-Whisper exited with code {result.returncode}:\n{''.join(result.stderr_tail)}")
+            return False
+        return True
+
+    @staticmethod
+    def counting_segments(on_segment, telemetry):
+        def handle_segment(segment):
+            telemetry.segment()
+            on_segment(segment)
+        return handle_segment
+
+    def run_on_server(self, input_file, lang, beam_size, log_callback, on_segment):
+        log_callback(f"Submitting {input_file} to the transcription server at {self.server.address[0]}:{self.server.address[1]}\n")
+
+        def handle_segment(segment):
+            log_callback(f"[{format_srt_timestamp(segment.start_ms)} --> {format_srt_timestamp(segment.end_ms)}] {segment.text}\n")
+            on_segment(segment)
+
+        try:
+            finished = self.server.transcribe(input_file, lang, beam_size, self.model, handle_segment, self.stop_flag)
+        except Exception as e:
+            log_callback(f"Transcription server error: {str(e)}\n")
+            return False
+        if not finished:
+            log_callback("Transcription stopped.\n")
+        return finished
+
+    def should_chunk(self, duration_ms):
+        # Only worth it if the file splits into at least two full chunks
+        return bool(self.chunk_minutes and duration_ms and duration_ms >= 2 * self.chunk_minutes * 60000)
+
+    def transcribe_chunked(self, audio_file, source_file, duration_ms, cjk_srt_file, cjk_tmp_srt_file, log_callback, lang, beam_size, tracker):
+        silences = detect_silences(source_file)
+        chunks = plan_chunks(duration_ms, silences, self.chunk_minutes * 60000)
+        log_callback(f"Splitting {audio_file} into {len(chunks)} chunks at silences\n")
+
+        with tempfile.TemporaryDirectory(prefix='liver-chunks-') as work_dir:
+            def transcribe_chunk(chunk_path):
+                segments = []
+
+                def on_segment(segment):
+                    segments.append(segment)
+                    tracker.update(segment.end_ms, chunk_path)
+
+                if not self.run_whisper(chunk_path, work_dir, lang, beam_size, log_callback, on_segment):
+                    return None
+                return segments
+
+            segments = transcribe_in_chunks(source_file, chunks, transcribe_chunk, work_dir, self.chunk_workers, self.stop_flag)
+            if segments is None:
+                return False
+
+        # Chunks finish out of order, so the stitched file is written in one go
+        with SrtWriter(cjk_tmp_srt_file) as writer:
+            for segment in segments:
+                writer.write(segment)
+        os.replace(cjk_tmp_srt_file, cjk_srt_file)
+        return True
+
+    def read_resume_point(self, cjk_tmp_srt_file):
+        # Keeps the complete segments of a partial transcript left by a stopped
+        # or crashed run and truncates anything after the last complete one.
+        if not os.path.exists(cjk_tmp_srt_file):
+            return None
+        segments, size = read_complete_segments(cjk_tmp_srt_file)
+        if not segments:
+            return None
+        with open(cjk_tmp_srt_file, 'r+b') as f:
+            f.truncate(size)
+        return segments
+
+    def transcribe_resumed(self, audio_file, source_file, resume_segments, cjk_srt_file, cjk_tmp_srt_file, log_callback, lang, beam_size, tracker):
+        offset_ms = resume_segments[-1].end_ms
+        tracker.initial_ms = offset_ms
+        log_callback(f"Resuming {audio_file} from {format_srt_timestamp(offset_ms)} ({len(resume_segments)} segments kept)\n")
+
+        with tempfile.TemporaryDirectory(prefix='liver-resume-') as work_dir:
+            remainder_file = os.path.join(work_dir, 'remainder.wav')
+            extract_audio(source_file, remainder_file, offset_ms)
+            # New segments are shifted by the offset and continue the numbering
+            with SrtWriter(cjk_tmp_srt_file, start_index=len(resume_segments) + 1, mode='a', offset_ms=offset_ms) as writer:
+                def on_segment(segment):
+                    writer.write(segment)
+                    tracker.update(segment.end_ms)
+
+                if not self.run_whisper(remainder_file, work_dir, lang, beam_size, log_callback, on_segment):
+                    return False
+
+        # The partial file now holds the whole transcript; keep it until the
+        # copy is in place so another interruption can still resume from it.
+        copy_file_atomic(cjk_tmp_srt_file, cjk_srt_file)
+        return True
+
+    def transcribe_whole(self, audio_file, source_file, cjk_srt_file, cjk_tmp_srt_file, log_callback, lang, beam_size, tracker):
+        with tempfile.TemporaryDirectory(prefix='liver-') as work_dir:
+            # Faster-Whisper names its SRT after its input, so only the original
+            # file is transcribed straight next to itself; a decoded copy writes
+            # into a scratch directory and its SRT is copied into place.
+            output_dir = os.path.dirname(audio_file) if source_file == audio_file else work_dir
+
+            with SrtWriter(cjk_tmp_srt_file) as writer:
+                def on_segment(segment):
+                    writer.write(segment)
+                    tracker.update(segment.end_ms)
+
+                if not self.run_whisper(source_file, output_dir, lang, beam_size, log_callback, on_segment):
+                    return False
+
+            if self.server:
+                # The server writes no SRT of its own; the live transcript is the result
+                copy_file_atomic(cjk_tmp_srt_file, cjk_srt_file)
+            elif output_dir == work_dir:
+                produced_srt_file = os.path.join(work_dir, f"{os.path.splitext(os.path.basename(source_file))[0]}.srt")
+                if os.path.exists(produced_srt_file):
+                    copy_file_atomic(produced_srt_file, cjk_srt_file)
+        return True
+
+    def transcribe_and_write_srt_live(self, audio_file, log_callback, lang, beam_size, progress_callback=None, input_file=None):
+        if not self.telemetry:
+            return self.transcribe_file(audio_file, log_callback, lang, beam_size, progress_callback, input_file)
+
+        self.job_telemetry = JobTelemetry(audio_file, self.model, lang, beam_size, self.device, self.threads, 'server' if self.server else 'process')
+        succeeded = False
+        try:
+            succeeded = self.transcribe_file(audio_file, log_callback, lang, beam_size, progress_callback, input_file)
+            return succeeded
+        finally:
+            job, self.job_telemetry = self.job_telemetry, None
+            # Cache hits and existing SRTs never reach a transcription mode
+            if job.mode:
+                status = 'stopped' if self.stop_flag.is_set() else 'done' if succeeded else 'failed'
+                try:
+                    self.telemetry.write(job.finish(status))
+                except OSError as e:
+                    log_callback(f"Could not write telemetry: {str(e)}\n")
+
+    def describe_job(self, mode, audio_ms):
+        if self.job_telemetry:
+            self.job_telemetry.mode = mode
+            self.job_telemetry.audio_ms = audio_ms
+
+    def transcribe_file(self, audio_file, log_callback, lang, beam_size, progress_callback=None, input_file=None):
+        # input_file is an already decoded copy of audio_file (see prefetch.py);
+        # it is what gets read, while every output is still named after audio_file.
+        output_dir = os.path.dirname(audio_file)
+        base_name = os.path.splitext(os.path.basename(audio_file))[0]
+        cjk_srt_file = os.path.join(output_dir, f"{base_name}.srt")
+        cjk_tmp_srt_file = f"{output_dir}/{base_name}.{lang}.tmp.srt"
+
+        # With a cache, an SRT next to the audio is only trusted if it came out
+        # of the cache for this exact media and parameter set.
+        cache_key = None
+        previous_mtime = None
+        if self.cache:
+            try:
+                cache_key = self.cache.key(audio_file, self.model, lang, beam_size, backend_identity(self.server))
+            except (OSError, RuntimeError) as e:
+                log_callback(f"Transcription server error: {str(e)}\n")
+                return False
+            if self.cache.get(cache_key, cjk_srt_file):
+                log_callback(f"Cache hit for {audio_file}. SRT file restored at {cjk_srt_file}\n")
+                return True
+            if os.path.exists(cjk_srt_file):
+                previous_mtime = os.path.getmtime(cjk_srt_file)
+                log_callback(f"Existing {cjk_srt_file} does not match the current settings, transcribing again.\n")
+        elif os.path.exists(cjk_srt_file):
+            log_callback(f"Transcription completed. SRT file saved at {cjk_srt_file}\n")
+            return True
+
+        log_callback(f"Starting transcription for {audio_file}\n")
 
-        with open(cjk_tmp_srt_file, 'w', encoding='utf-8') as cjk_f:
-            segment_index = 1
-            for line in process.stdout:
-                if self.stop_flag.is_set():
-                    process.terminate()
-                    log_callback("Transcription stopped.\n")
-                    return
-
-                if '-->' in line:
-                    log_callback(line)
-                    match = SUBTITLE_REGEX.match(line)
-                    if match:
-                        hours_start, minutes_seconds_start, hours_end, minutes_seconds_end, text = match.groups()
-                        start_time = format_timestamp_from_match(hours_start, minutes_seconds_start)
-                        end_time = format_timestamp_from_match(hours_end, minutes_seconds_end)
-                        log_callback(f"{start_time} --> {end_time}\n")
-                        cjk_f.write(f"{segment_index}\n{start_time} --> {end_time}\n{text.strip()}\n\n")
-                        cjk_f.flush()
-                        segment_index += 1
-
-        process.stdout.close()
-        process.wait()
-
-        if os.path.exists(cjk_srt_file):
+        source_file = input_file or audio_file
+        if input_file:
+            log_callback(f"Using pre-extracted audio {input_file}\n")
+
+        # Probed once; drives the progress bar and the chunking decision
+        duration_ms = probe_duration_ms(source_file)
+        tracker = ProgressTracker(duration_ms, progress_callback)
+
+        resume_segments = self.read_resume_point(cjk_tmp_srt_file) if self.resume else None
+        if resume_segments:
+            self.describe_job('resume', duration_ms - resume_segments[-1].end_ms if duration_ms else None)
+            if not self.transcribe_resumed(audio_file, source_file, resume_segments, cjk_srt_file, cjk_tmp_srt_file, log_callback, lang, beam_size, tracker):
+                return False
+        elif self.should_chunk(duration_ms):
+            self.describe_job('chunked', duration_ms)
+            if not self.transcribe_chunked(audio_file, source_file, duration_ms, cjk_srt_file, cjk_tmp_srt_file, log_callback, lang, beam_size, tracker):
+                log_callback("Transcription failed or was stopped before completion.\n")
+                return False
+        else:
+            self.describe_job('whole', duration_ms)
+            if not self.transcribe_whole(audio_file, source_file, cjk_srt_file, cjk_tmp_srt_file, log_callback, lang, beam_size, tracker):
+                return False
+
+        if os.path.exists(cjk_srt_file) and os.path.getmtime(cjk_srt_file) != previous_mtime:
             log_callback(f"Transcription completed. SRT file saved at {cjk_srt_file}\n")
             try:
                 clean_srt(cjk_srt_file)
@@ -139,8 +395,16 @@ class SubtitleTranscriber:
                 log_callback(f"Removed {cjk_tmp_srt_file}\n")
             except:
                 pass
+            if cache_key:
+                try:
+                    self.cache.put(cache_key, cjk_srt_file)
+                    log_callback(f"Stored {cjk_srt_file} in the transcription cache\n")
+                except OSError as e:
+                    log_callback(f"Could not store {cjk_srt_file} in the transcription cache: {str(e)}\n")
+            return True
         else:
             log_callback("Transcription failed or was stopped before completion.\n")
+            return False
 
     def start_transcription(self, audio_file, log_callback, lang, beam_size):
         if self.thread and self.thread.is_alive():
@@ -161,6 +425,7 @@ class SubtitleTranscriber:
 class TranscriptionApp(ctk.CTk):
     def __init__(self):
         super().__init__()
+        self.log_sink = LogSink()
 
         self.title("Subtitle Transcriber")
         self.geometry("800x800")
@@ -172,9 +437,27 @@ class TranscriptionApp(ctk.CTk):
         self.grid_rowconfigure(8, weight=1)
 
         self.create_widgets()
-        self.transcriber = SubtitleTranscriber()
+        self.after(LOG_FLUSH_INTERVAL_MS, self.flush_log)
+        # Scheduler events, (audio_file, status) or None once idle, are
+        # queued by worker threads and handled on the UI tick
+        self.status_events = queue.SimpleQueue()
+        self.statuses = {}
+        self.prefetcher = AudioPrefetcher(log_callback=self.log_callback, needs_audio=lambda job: needs_audio(self.cache, self.server, job))
+        self.store = JobStore()
+        self.scheduler = TranscriptionScheduler(self.create_transcriber, log_callback=self.log_callback, prefetcher=self.prefetcher, store=self.store,
+                                                status_callback=self.on_status, idle_callback=lambda: self.status_events.put(None))
+        self.cache = TranscriptionCache()
+        self.telemetry = TelemetryLog()
         self.queue = []
+        # Files restored from the job store, resumed as they were stored
+        self.recovered = set()
         self.is_processing = False
+        self.threads_per_worker = 0
+        self.chunk_minutes = 0
+        self.resume = True
+        self.server = None
+        self.after(LOG_FLUSH_INTERVAL_MS, self.handle_status_events)
+        self.restore_queue()
 
     def create_widgets(self):
         # Model selection
@@ -186,6 +469,12 @@ class TranscriptionApp(ctk.CTk):
         model_menu = ctk.CTkOptionMenu(model_frame, variable=self.model_var, values=models, command=self.update_language_menu)
         model_menu.pack(side="left", padx=5)
 
+        # Optional warm-model server (host:port); empty runs a new process per file
+        self.server_var = tk.StringVar(value='')
+        ctk.CTkLabel(model_frame, text="Server:").pack(side="left", padx=5)
+        server_entry = ctk.CTkEntry(model_frame, textvariable=self.server_var, placeholder_text="host:port")
+        server_entry.pack(side="left", padx=5)
+
         # Language selection
         self.filename_var = tk.StringVar(value='')
         self.language_var = tk.StringVar(value='yue')
@@ -205,6 +494,22 @@ class TranscriptionApp(ctk.CTk):
         beam_entry = ctk.CTkEntry(beam_frame, textvariable=self.beam_size_var)
         beam_entry.pack(side="left", padx=5)
 
+        # Worker slots and CPU threads per worker
+        self.workers_var = tk.StringVar(value='1')
+        ctk.CTkLabel(beam_frame, text="Workers:").pack(side="left", padx=5)
+        workers_entry = ctk.CTkEntry(beam_frame, textvariable=self.workers_var, width=50)
+        workers_entry.pack(side="left", padx=5)
+        self.threads_var = tk.StringVar(value='0')
+        ctk.CTkLabel(beam_frame, text="Threads/Worker:").pack(side="left", padx=5)
+        threads_entry = ctk.CTkEntry(beam_frame, textvariable=self.threads_var, width=50)
+        threads_entry.pack(side="left", padx=5)
+
+        # Long files are split at silences into chunks of about this many minutes (0 = off)
+        self.chunk_minutes_var = tk.StringVar(value='0')
+        ctk.CTkLabel(beam_frame, text="Split (min):").pack(side="left", padx=5)
+        chunk_entry = ctk.CTkEntry(beam_frame, textvariable=self.chunk_minutes_var, width=50)
+        chunk_entry.pack(side="left", padx=5)
+
         # File selection
         file_frame = ctk.CTkFrame(self)
         file_frame.grid(row=3, column=0, padx=10, pady=10, sticky="ew")
@@ -218,11 +523,16 @@ class TranscriptionApp(ctk.CTk):
         browse_button.pack(side="left", padx=5)
         remove_button = ctk.CTkButton(file_frame, text="Remove Selected", command=self.remove_selected_files)
         remove_button.pack(side="left", padx=5)
+        prioritize_button = ctk.CTkButton(file_frame, text="Run Next", command=self.prioritize_selected_files)
+        prioritize_button.pack(side="left", padx=5)
         # Control buttons
         button_frame = ctk.CTkFrame(self)
         button_frame.grid(row=4, column=0, padx=10, pady=10, sticky="ew")
         start_button = ctk.CTkButton(button_frame, text="Start Processing", command=self.start_processing)
         start_button.pack(side="left", padx=5, expand=True, fill="x")
+        self.resume_var = tk.BooleanVar(value=True)
+        resume_checkbox = ctk.CTkCheckBox(button_frame, text="Resume partial transcripts", variable=self.resume_var)
+        resume_checkbox.pack(side="left", padx=5)
 
         # Progress bar
         self.progress_var = tk.DoubleVar()
@@ -256,18 +566,28 @@ class TranscriptionApp(ctk.CTk):
 
     def browse_and_add_files(self):
         initial_dir = os.path.expanduser("~")
-        filenames = filedialog.askopenfilenames(filetypes=[("Audio/Video Files", "*.mkv *.mp4 *.wav *.mp3 *.aac *.opus")], initialdir=initial_dir)
+        filenames = filedialog.askopenfilenames(filetypes=[("Audio/Video Files", ' '.join(f"*{extension}" for extension in MEDIA_EXTENSIONS))], initialdir=initial_dir)
         for filename in filenames:
             if filename not in self.queue:
                 self.queue.append(filename)
                 self.queue_listbox.insert(tk.END, filename)
                 self.log_callback(f"Added to queue: {filename}\n")
+                if self.is_processing:
+                    self.submit_file(filename)
+                else:
+                    # Persist right away so the queue survives a crash before Start
+                    self.store.add(filename, *self.job_settings())
                 
     def remove_selected_files(self):
         selected_indices = self.queue_listbox.curselection()
         for index in reversed(selected_indices):
             if 0 <= index < len(self.queue):
                 file_path = self.queue_listbox.get(index)
+                status = self.scheduler.snapshot().get(file_path)
+                if status == RUNNING or (self.is_processing and status in ACTIVE_STATES):
+                    self.log_callback(f"Cannot remove {file_path} while it is being processed.\n")
+                    continue
+                self.scheduler.forget(file_path)
                 del self.queue[index]  # Use del instead of remove to ensure we remove the correct index
                 self.queue_listbox.delete(index)
                 self.log_callback(f"Removed from queue: {file_path}\n")
@@ -280,6 +600,44 @@ class TranscriptionApp(ctk.CTk):
             self.queue.clear()
             self.queue_listbox.delete(0, tk.END)
 
+    def prioritize_selected_files(self):
+        # Selected files jump ahead of everything else still waiting
+        selected = [self.queue_listbox.get(index) for index in self.queue_listbox.curselection()]
+        priority = self.store.max_priority() + 1
+        for file_path in reversed(selected):
+            self.scheduler.set_priority(file_path, priority)
+            index = self.queue.index(file_path)
+            del self.queue[index]
+            self.queue_listbox.delete(index)
+            self.queue.insert(0, file_path)
+            self.queue_listbox.insert(0, file_path)
+            priority += 1
+
+    def restore_queue(self):
+        # Reload whatever the last session left in the store; if it was
+        # transcribing when it stopped, carry on straight away
+        interrupted = self.store.recover()
+        for file_path in self.store.pending():
+            # Resumed with the settings and priority they were stored with
+            self.recovered.add(file_path)
+            self.queue.append(file_path)
+            self.queue_listbox.insert(tk.END, file_path)
+        if interrupted:
+            self.log_callback(f"Resuming {len(self.queue)} queued files from the last session.\n")
+            self.start_processing()
+        elif self.queue:
+            self.log_callback(f"Restored {len(self.queue)} queued files from the last session.\n")
+
+    def create_transcriber(self):
+        return SubtitleTranscriber(threads=self.threads_per_worker, cache=self.cache, chunk_minutes=self.chunk_minutes, resume=self.resume, server=self.server, telemetry=self.telemetry)
+
+    def job_settings(self):
+        lang = self.language_var.get() if self.model_var.get() != 'cantonese' else ''
+        return lang, self.beam_size_var.get(), self.model_var.get()
+
+    def submit_file(self, file_path):
+        self.scheduler.submit(file_path, *self.job_settings())
+
     def start_processing(self):
         if self.is_processing:
             self.log_callback("Transcription is already in progress.\n")
@@ -287,49 +645,263 @@ class TranscriptionApp(ctk.CTk):
         if not self.queue:
             self.log_callback("No files to process. Please select a file or add files to the queue.\n")
             return
+        # Checked before anything starts, so a typo is reported and the
+        # Start button keeps working
+        try:
+            settings = self.run_settings()
+        except ValueError as e:
+            self.log_callback(f"Invalid setting: {str(e)}\n")
+            return
         self.is_processing = True
-        self.process_next_in_queue()
+        self.process_next_in_queue(*settings)
+
+    def run_settings(self):
+        # (threads, chunk minutes, workers, server address) from the entries;
+        # raises ValueError naming the first one that does not parse
+        entries = [
+            ("threads per worker", self.threads_var.get() or 0, int),
+            ("chunk minutes", self.chunk_minutes_var.get() or 0, float),
+            ("workers", self.workers_var.get() or 1, int),
+        ]
+        values = []
+        for name, text, parse in entries:
+            try:
+                value = parse(text)
+            except ValueError:
+                raise ValueError(f"{name} must be a number, not {text!r}") from None
+            if value < 0:
+                raise ValueError(f"{name} cannot be negative")
+            values.append(value)
+        server_address = self.server_var.get().strip()
+        try:
+            address = parse_address(server_address) if server_address else None
+        except ValueError:
+            raise ValueError(f"server address must be host:port, not {server_address!r}") from None
+        return (*values, address)
+
+    def process_next_in_queue(self, threads, chunk_minutes, workers, server_address):
+        self.threads_per_worker = threads
+        self.chunk_minutes = chunk_minutes
+        self.resume = self.resume_var.get()
+        self.server = TranscriptionServerClient(server_address) if server_address else None
+        self.scheduler.set_workers(workers)
+        self.prefetcher.lookahead = max(DEFAULT_LOOKAHEAD, self.scheduler.workers)
+        # Results of the previous run no longer count towards progress
+        self.scheduler.clear_finished()
+        self.progress_var.set(0)
+        # Submitting in list order, highest priority first, keeps "Run Next" choices.
+        # Jobs recovered from the last session are not resubmitted, which would
+        # overwrite their stored settings with the current ones; start() runs them.
+        priority = len(self.queue)
+        for file_path in self.queue:
+            self.log_callback(f"Processing: {file_path}\n")
+            if file_path not in self.recovered:
+                self.scheduler.submit(file_path, *self.job_settings(), priority=priority)
+            priority -= 1
+        self.recovered.clear()
+        self.scheduler.start()
+        self.statuses = self.scheduler.snapshot()
+        self.refresh_status_view()
+
+    def on_status(self, audio_file, status):
+        self.status_events.put((audio_file, status))
+
+    def handle_status_events(self):
+        changed = False
+        idle = False
+        while True:
+            try:
+                event = self.status_events.get_nowait()
+            except queue.Empty:
+                break
+            if event is None:
+                idle = True
+                continue
+            file_path, status = event
+            self.statuses[file_path] = status
+            changed = True
+            if status in (DONE, FAILED) and file_path in self.queue:
+                # Drop finished files from the pending queue
+                index = self.queue.index(file_path)
+                del self.queue[index]
+                self.queue_listbox.delete(index)
+                if status == DONE:
+                    self.log_callback(f"Finished processing: {file_path}\n")
+                else:
+                    self.log_callback(f"Failed: {file_path} (giving up after {self.store.max_attempts} attempts)\n")
 
-    def process_next_in_queue(self):
-        if not self.queue:
+        if changed or (self.is_processing and RUNNING in self.statuses.values()):
+            self.refresh_status_view()
+
+        if idle and self.is_processing and not self.scheduler.is_busy():
             self.is_processing = False
-            self.log_callback("All transcriptions completed.\n")
-            return
+            failed = sum(1 for status in self.statuses.values() if status == FAILED)
+            self.log_callback(f"All transcriptions completed ({failed} failed).\n" if failed else "All transcriptions completed.\n")
+        self.after(LOG_FLUSH_INTERVAL_MS, self.handle_status_events)
 
-        file_path = self.queue[0]  # Get the first file, but don't remove it yet
-        self.filename_var.set(file_path)
-        self.log_callback(f"Processing: {file_path}\n")
-        
-        self.transcriber.model = self.model_var.get()
-        lang = self.language_var.get() if self.model_var.get() != 'cantonese' else ''
-        self.transcriber.start_transcription(file_path, self.log_callback, lang, self.beam_size_var.get())
-        self.after(100, self.check_transcription_status)
+    def refresh_status_view(self):
+        statuses = self.statuses
 
-    def check_transcription_status(self):
-        if self.transcriber.thread and self.transcriber.thread.is_alive():
-            self.after(100, self.check_transcription_status)
-        else:
-            if self.queue:  # Check if there's still an item in the queue
-                processed_file = self.queue.pop(0)  # Remove the processed file
-                self.queue_listbox.delete(0)  # Remove the first item from the listbox
-                self.log_callback(f"Finished processing: {processed_file}\n")
-                self.process_next_in_queue()
-            else:
-                self.log_callback("No more files to process.\n")
-                self.is_processing = False
+        # Per-file status view
+        progress = self.scheduler.progress_snapshot()
+        self.queue_list.delete(0, tk.END)
+        for file_path, status in statuses.items():
+            if status == RUNNING and file_path in progress:
+                percent, realtime_factor = progress[file_path]
+                status = f"{status} {percent:.0f}% {realtime_factor:.1f}x"
+            self.queue_list.insert(tk.END, f"[{status}] {file_path}")
+
+        # Overall progress: finished files count fully, running ones by their percentage
+        if statuses:
+            completed = sum(100.0 for status in statuses.values() if status not in ACTIVE_STATES)
+            completed += sum(progress.get(file_path, (0.0, 0.0))[0] for file_path, status in statuses.items() if status == RUNNING)
+            self.progress_var.set(completed / len(statuses))
+
+        running = [file_path for file_path, status in statuses.items() if status == RUNNING]
+        self.filename_var.set(', '.join(running))
 
     def stop_processing(self):
-        self.transcriber.stop_transcription()
+        self.scheduler.stop()
         self.is_processing = False
         self.queue.clear()
+        self.recovered.clear()
+        self.queue_listbox.delete(0, tk.END)
         self.queue_list.delete(0, tk.END)
         self.log_callback("Transcription stopped. Queue processing interrupted.\n")
 
     def log_callback(self, message):
-        self.log_text.insert(tk.END, message)
-        self.log_text.see(tk.END)
-        self.update_idletasks()
+        # Safe to call from any thread; the text shows up on the next flush_log tick
+        self.log_sink.write(message)
+
+    def flush_log(self):
+        text = self.log_sink.drain()
+        if text:
+            self.log_text.insert(tk.END, text)
+            excess = int(self.log_text.index('end-1c').split('.')[0]) - self.log_sink.max_lines
+            if excess > 0:
+                self.log_text.delete('1.0', f'{excess + 1}.0')
+            self.log_text.see(tk.END)
+        self.after(LOG_FLUSH_INTERVAL_MS, self.flush_log)
+
+def run_headless(args):
+    cache = None if args.no_cache else TranscriptionCache(args.cache_dir, args.cache_size_mb << 20)
+
+    server = TranscriptionServerClient(args.server) if args.server else None
+    telemetry = None if args.no_telemetry else TelemetryLog(args.telemetry_file, args.prometheus_file)
+
+    def create_transcriber():
+        return SubtitleTranscriber(model=args.model, device=args.device, threads=args.threads, cache=cache,
+                                   chunk_minutes=args.chunk_minutes, chunk_workers=args.chunk_workers, resume=not args.no_resume, server=server, telemetry=telemetry,
+                                   executable=[args.executable])
+
+    def log_callback(message):
+        print(message, end='', flush=True)
+
+    def status_callback(audio_file, status):
+        print(f"[{status}] {audio_file}", flush=True)
+
+    prefetcher = AudioPrefetcher(args.prefetch_dir, args.prefetch_size_mb << 20, args.prefetch, log_callback,
+                                 needs_audio=lambda job: needs_audio(cache, server, job)) if args.prefetch else None
+    store = JobStore(args.job_db or ':memory:', max_attempts=args.retries + 1)
+    # With a job database, whatever a crashed or interrupted run left pending
+    # is picked up again by start(), with the settings it was queued with
+    store.recover()
+    recovered = store.pending()
+    if recovered:
+        log_callback(f"Resuming {len(recovered)} pending jobs from {args.job_db}\n")
+    files = list(recovered)
+    scheduler = TranscriptionScheduler(create_transcriber, workers=args.workers, log_callback=log_callback, status_callback=status_callback, prefetcher=prefetcher, store=store)
+    lang = args.lang if args.model != 'cantonese' else ''
+    for audio_file in map(os.path.abspath, args.files):
+        if audio_file in recovered:
+            continue
+        files.append(audio_file)
+        scheduler.submit(audio_file, lang, args.beam_size, args.model, args.priority)
+    scheduler.start()
+    try:
+        if args.watch:
+            watch_folders(args, scheduler, store, lang, files, log_callback)
+        scheduler.wait()
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+    snapshot = scheduler.snapshot()
+    statuses = {audio_file: snapshot.get(audio_file) for audio_file in dict.fromkeys(files)}
+    failed = [audio_file for audio_file, status in statuses.items() if status != DONE]
+    print(f"Finished {len(statuses) - len(failed)}/{len(statuses)} files.")
+    return 1 if failed else 0
+
+def srt_path(audio_file):
+    return f"{os.path.splitext(audio_file)[0]}.srt"
+
+def needs_audio(cache, server, job):
+    # Whether transcribe_file will read the audio at all: not on a cache hit,
+    # nor, without a cache, when an SRT is already next to it
+    if cache:
+        try:
+            identity = backend_identity(server)
+        except (OSError, RuntimeError):
+            return True
+        return not cache.contains(cache.key(job.audio_file, job.model, job.lang, job.beam_size, identity))
+    return not os.path.exists(srt_path(job.audio_file))
+
+def watch_folders(args, scheduler, store, lang, files, log_callback):
+    # Runs until interrupted, queueing every new recording that has settled
+    def should_skip(audio_file):
+        # Already transcribed, or already waiting in the job store
+        return os.path.exists(srt_path(audio_file)) or store.states().get(audio_file) in ACTIVE_STATES
+
+    def on_file(audio_file):
+        if scheduler.submit(audio_file, lang, args.beam_size, args.model, args.priority):
+            files.append(audio_file)
+
+    watcher = FolderWatcher(args.watch, on_file, should_skip, args.recursive, args.watch_interval, args.settle_seconds, log_callback)
+    watcher.run()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Subtitle Transcriber")
+    parser.add_argument('files', nargs='*', help="Audio/video files to transcribe")
+    parser.add_argument('--headless', action='store_true', help="Run without the GUI")
+    parser.add_argument('--serve', action='store_true', help="Run the warm-model transcription server instead")
+    parser.add_argument('--server', type=parse_address, default=None, help="host:port of the transcription server to use (or to listen on with --serve). "
+                        "It runs the faster-whisper package, without XXL's options or the cantonese model")
+    parser.add_argument('--server-backend', choices=sorted(BACKENDS), default='faster-whisper', help="Model backend for --serve")
+    parser.add_argument('--model', default='large-v3')
+    parser.add_argument('--executable', default=FASTER_WHISPER_EXECUTABLE[0], help="Path to Faster-Whisper-XXL")
+    parser.add_argument('--device', default='CUDA')
+    parser.add_argument('--lang', default='yue')
+    parser.add_argument('--beam-size', default='10')
+    parser.add_argument('--workers', type=int, default=1, help="Number of files transcribed at once")
+    parser.add_argument('--threads', type=int, default=0, help="CPU threads per worker (0 = Faster-Whisper default)")
+    parser.add_argument('--cache-dir', default=None, help="Transcription cache directory")
+    parser.add_argument('--cache-size-mb', type=int, default=DEFAULT_CACHE_SIZE >> 20, help="Evict cached transcripts beyond this size")
+    parser.add_argument('--no-cache', action='store_true', help="Only skip files whose SRT already exists")
+    parser.add_argument('--chunk-minutes', type=float, default=0, help="Split long files at silences into chunks of about this length (0 = off)")
+    parser.add_argument('--chunk-workers', type=int, default=2, help="Chunks of one file transcribed at once")
+    parser.add_argument('--no-resume', action='store_true', help="Start over instead of resuming from a partial .tmp.srt")
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_LOOKAHEAD, help="Files decoded ahead of the workers (0 = off)")
+    parser.add_argument('--prefetch-dir', default=None, help="Directory for pre-extracted audio")
+    parser.add_argument('--telemetry-file', default=None, help="JSON-lines file that gets one timing record per transcribed file")
+    parser.add_argument('--no-telemetry', action='store_true', help="Do not record job timings")
+    parser.add_argument('--prometheus-file', default=None, help="Also keep this node exporter textfile (.prom) up to date")
+    parser.add_argument('--watch', action='append', default=[], metavar='DIR', help="Keep watching DIR for new media and transcribe it (repeatable; implies --headless)")
+    parser.add_argument('--recursive', action='store_true', help="Also watch subdirectories")
+    parser.add_argument('--watch-interval', type=float, default=DEFAULT_SCAN_INTERVAL, help="Seconds between scans of the watched folders")
+    parser.add_argument('--settle-seconds', type=float, default=DEFAULT_SETTLE_SECONDS, help="A file is picked up once it has not changed for this long")
+    parser.add_argument('--job-db', default=None, help="SQLite job queue that survives crashes (default: in memory)")
+    parser.add_argument('--retries', type=int, default=DEFAULT_MAX_ATTEMPTS - 1, help="Retries for a failed file, with exponential backoff")
+    parser.add_argument('--priority', type=int, default=0, help="Priority of the given files in a shared job database")
+    parser.add_argument('--prefetch-size-mb', type=int, default=DEFAULT_PREFETCH_SIZE >> 20, help="Evict pre-extracted audio beyond this size")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.serve:
+        address = args.server or DEFAULT_ADDRESS
+        whisper_server.main(['--address', f"{address[0]}:{address[1]}", '--backend', args.server_backend,
+                             '--device', args.device, '--threads', str(args.threads), '--preload', args.model])
+        sys.exit(0)
+    if args.headless or args.watch:
+        sys.exit(run_headless(args))
     app = TranscriptionApp()
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,31 @@
+import queue
+
+DEFAULT_MAX_LINES = 5000
+DEFAULT_MAX_RECORDS = 5000
+
+
+class LogSink:
+    # Thread-safe log pipeline for the Tk UI. Worker threads only enqueue; the
+    # UI thread drains everything queued since the last tick in one batch. The
+    # log widget is the only scrollback; flush_log trims it to max_lines, so
+    # memory stays flat however long a run is.
+    def __init__(self, max_lines=DEFAULT_MAX_LINES):
+        self.max_lines = max_lines
+        self.records = queue.SimpleQueue()
+
+    def write(self, message):
+        self.records.put(message)
+
+    def drain(self, max_records=DEFAULT_MAX_RECORDS):
+        # Returns the text to append to the view. A burst larger than the
+        # scrollback only yields its last max_lines lines.
+        batch = []
+        while len(batch) < max_records:
+            try:
+                batch.append(self.records.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return ''
+        new_lines = ''.join(batch).splitlines(keepends=True)
+        return ''.join(new_lines[-self.max_lines:])
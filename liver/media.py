@@ -0,0 +1,65 @@
+import re
+import subprocess
+
+# ffmpeg silencedetect reports, on stderr:
+#   [silencedetect @ 0x...] silence_start: 12.345
+#   [silencedetect @ 0x...] silence_end: 13.1 | silence_duration: 0.755
+SILENCE_START_REGEX = re.compile(r'silence_start: (-?\d+(?:\.\d+)?)')
+SILENCE_END_REGEX = re.compile(r'silence_end: (\d+(?:\.\d+)?)')
+
+# Files liver offers to transcribe, in the file dialog and in watched folders
+MEDIA_EXTENSIONS = ('.mkv', '.mp4', '.wav', '.mp3', '.aac', '.opus')
+
+# Hide the console window ffmpeg would otherwise flash up in the windowed build
+CREATE_NO_WINDOW = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+
+def probe_duration_ms(audio_file):
+    command = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        audio_file,
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, creationflags=CREATE_NO_WINDOW)
+        return int(round(float(result.stdout.strip()) * 1000))
+    except (OSError, ValueError):
+        return None
+
+
+def detect_silences(audio_file, noise_db=-35, min_silence=0.4):
+    # Returns [(start_ms, end_ms)] for every stretch quieter than noise_db
+    command = [
+        'ffmpeg', '-hide_banner', '-nostats', '-i', audio_file,
+        '-vn', '-af', f'silencedetect=noise={noise_db}dB:d={min_silence}',
+        '-f', 'null', '-',
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='replace', creationflags=CREATE_NO_WINDOW)
+    silences = []
+    start = None
+    for line in result.stderr.splitlines():
+        match = SILENCE_START_REGEX.search(line)
+        if match:
+            start = max(0, int(round(float(match.group(1)) * 1000)))
+            continue
+        match = SILENCE_END_REGEX.search(line)
+        if match and start is not None:
+            silences.append((start, int(round(float(match.group(1)) * 1000))))
+            start = None
+    return silences
+
+
+def extract_audio(audio_file, out_path, start_ms=None, duration_ms=None):
+    # Decode to 16 kHz mono PCM, the format Whisper resamples to anyway
+    command = ['ffmpeg', '-hide_banner', '-nostats', '-loglevel', 'error', '-y']
+    if start_ms:
+        command.extend(['-ss', f'{start_ms / 1000:.3f}'])
+    command.extend(['-i', audio_file])
+    if duration_ms:
+        command.extend(['-t', f'{duration_ms / 1000:.3f}'])
+    command.extend(['-vn', '-ac', '1', '-ar', '16000', '-c:a', 'pcm_s16le', out_path])
+    result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='replace', creationflags=CREATE_NO_WINDOW)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to extract audio from {audio_file}: {result.stderr.strip()}")
+    return out_path
@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+
+from cache import default_cache_dir, evict_lru, media_hash
+from media import extract_audio
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFETCH_SIZE = 20 << 30
+DEFAULT_LOOKAHEAD = 2
+
+
+class AudioPrefetcher:
+    # Decodes queued files to 16 kHz mono PCM in the background, so container
+    # demux and decode overlap with the transcription of the files before them.
+    # At most `lookahead` extracted files wait to be taken at any time.
+    # Extracted audio is kept in cache_dir under the media hash and evicted
+    # least-recently-used beyond max_bytes. needs_audio(job), if given, is
+    # asked just before a job is extracted; jobs it turns down (e.g. a
+    # transcript cache hit) are skipped without decoding anything.
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_PREFETCH_SIZE, lookahead=DEFAULT_LOOKAHEAD, log_callback=None, needs_audio=None):
+        self.cache_dir = cache_dir or default_cache_dir('audio')
+        self.max_bytes = max_bytes
+        self.lookahead = max(1, lookahead)
+        self.log_callback = log_callback or (lambda message: logger.info(message.rstrip()))
+        self.needs_audio = needs_audio
+        self.pending = []
+        self.ready = {}
+        self.extracting = None
+        self.condition = threading.Condition()
+        self.thread = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def schedule(self, jobs):
+        # Replaces what is waiting with jobs, in the order the workers will
+        # claim them, so priority changes and "Run Next" reorder extraction too.
+        # Extracted files no longer in jobs (removed from the queue) are
+        # deleted, so they do not hold lookahead slots forever.
+        wanted = {job.audio_file for job in jobs}
+        with self.condition:
+            stale = [audio_file for audio_file in self.ready if audio_file not in wanted]
+            stale_paths = {self.ready.pop(audio_file) for audio_file in stale} - set(self.ready.values())
+            self.pending = [job for job in jobs if job.audio_file not in self.ready and job.audio_file != self.extracting]
+            self.condition.notify_all()
+            if self.pending and self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+        for path in stale_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def take(self, audio_file):
+        # Returns the extracted PCM for audio_file, or None if the caller should
+        # read the original. Waits if the file is being extracted right now.
+        with self.condition:
+            waiting = [job for job in self.pending if job.audio_file == audio_file]
+            if waiting:
+                self.pending.remove(waiting[0])
+                return None
+            while self.extracting == audio_file:
+                self.condition.wait()
+            path = self.ready.pop(audio_file, None)
+            self.condition.notify_all()
+            return path
+
+    def clear(self):
+        with self.condition:
+            self.pending.clear()
+            self.ready.clear()
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending and len(self.ready) >= self.lookahead:
+                    self.condition.wait()
+                if not self.pending:
+                    # Idle; schedule() starts a new thread when more work arrives
+                    self.thread = None
+                    return
+                job = self.pending.pop(0)
+                audio_file = job.audio_file
+                self.extracting = audio_file
+
+            path = None
+            try:
+                if self.needs_audio is None or self.needs_audio(job):
+                    path = self.extract(audio_file)
+            except Exception as e:
+                self.log_callback(f"Could not pre-extract audio from {audio_file}: {str(e)}\n")
+
+            with self.condition:
+                self.extracting = None
+                if path:
+                    self.ready[audio_file] = path
+                self.condition.notify_all()
+
+    def extract(self, audio_file):
+        path = os.path.join(self.cache_dir, f"{media_hash(audio_file)}.wav")
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+
+        tmp_path = os.path.join(self.cache_dir, f".{os.path.basename(path)}")
+        try:
+            extract_audio(audio_file, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.log_callback(f"Pre-extracted audio for {audio_file}\n")
+        evict_lru(self.cache_dir, '.wav', self.max_bytes)
+        return path
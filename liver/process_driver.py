@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+# Faster-Whisper can print very long lines (e.g. progress bars without newlines)
+STREAM_LIMIT = 1 << 20
+
+# How often a running process checks its stop flag
+STOP_POLL_INTERVAL = 0.1
+
+# stderr lines kept to explain a failed run
+STDERR_TAIL_LINES = 20
+
+
+class ProcessResult:
+    def __init__(self, returncode, stopped, stderr_tail):
+        self.returncode = returncode
+        self.stopped = stopped
+        self.stderr_tail = stderr_tail
+
+
+async def pump_lines(stream, callback):
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        callback(line.decode('utf-8', errors='replace'))
+
+
+async def drive_process(command, on_stdout_line, on_stderr_line, stop_flag, on_start):
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        limit=STREAM_LIMIT,
+    )
+    if on_start:
+        on_start(process.pid)
+
+    # Both pipes are drained concurrently, so a chatty stderr can never fill
+    # its pipe buffer and block the child. If either pump fails (a line past
+    # STREAM_LIMIT, a callback raising), nothing drains that pipe any more, so
+    # the child is killed rather than waited on, and the error re-raised.
+    pumps = {
+        asyncio.ensure_future(pump_lines(process.stdout, on_stdout_line)),
+        asyncio.ensure_future(pump_lines(process.stderr, on_stderr_line)),
+    }
+    stopped = False
+    error = None
+    pending = pumps
+    while pending:
+        done, pending = await asyncio.wait(pending, timeout=STOP_POLL_INTERVAL, return_when=asyncio.FIRST_EXCEPTION)
+        error = next((task.exception() for task in done if task.exception() is not None), None)
+        if error is not None:
+            break
+        if pending and stop_flag is not None and stop_flag.is_set():
+            stopped = True
+            break
+
+    if pending:
+        if process.returncode is None:
+            process.kill()
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    returncode = await process.wait()
+    if error is not None:
+        raise error
+    return returncode, stopped
+
+
+def run_process(command, on_stdout_line, on_stderr_line=None, stop_flag=None, on_start=None):
+    # Runs command to completion on a private event loop (one per calling
+    # thread) and returns a ProcessResult. Raises OSError if it cannot start,
+    # or whatever a pump raised, once the process has been killed.
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+    def handle_stderr(line):
+        stderr_tail.append(line)
+        if on_stderr_line:
+            on_stderr_line(line)
+
+    returncode, stopped = asyncio.run(drive_process(command, on_stdout_line, handle_stderr, stop_flag, on_start))
+    return ProcessResult(returncode, stopped, list(stderr_tail))
+
+
+class ProgressTracker:
+    # Percent complete and speed (audio seconds per wall second) from segment
+    # end times. Several streams, e.g. chunks of one file, add up. initial_ms
+    # is audio already done before this run (a resumed transcript).
+    def __init__(self, duration_ms, callback=None, initial_ms=0):
+        self.duration_ms = duration_ms
+        self.callback = callback
+        self.initial_ms = initial_ms
+        self.started = time.monotonic()
+        self.positions = {}
+        self.lock = threading.Lock()
+
+    def update(self, position_ms, stream=None):
+        with self.lock:
+            if position_ms <= self.positions.get(stream, 0):
+                return
+            self.positions[stream] = position_ms
+            processed_ms = sum(self.positions.values())
+        if self.callback:
+            self.callback(self.percent(processed_ms), self.realtime_factor(processed_ms))
+
+    def percent(self, processed_ms):
+        if not self.duration_ms:
+            return 0.0
+        return min(100.0, (self.initial_ms + processed_ms) * 100.0 / self.duration_ms)
+
+    def realtime_factor(self, processed_ms):
+        elapsed = time.monotonic() - self.started
+        return processed_ms / 1000.0 / elapsed if elapsed > 0 else 0.0
@@ -0,0 +1,174 @@
+import logging
+import threading
+
+from job_store import JobStore, QUEUED, RUNNING, RETRYING, DONE, FAILED, STOPPED, ACTIVE_STATES
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionScheduler:
+    # Runs queued files on a fixed number of worker slots. Each slot owns its
+    # own transcriber (and therefore its own Faster-Whisper process), so up to
+    # `workers` files are transcribed at once. Shared by the GUI and headless mode.
+    # An optional prefetcher decodes queued files ahead of the workers.
+    # Jobs live in a JobStore, so with a file-backed store the queue survives
+    # a crash. status_callback fires on every state change and idle_callback
+    # once the queue has drained; both run on worker threads.
+    def __init__(self, transcriber_factory, workers=1, log_callback=None, status_callback=None, prefetcher=None, store=None, idle_callback=None):
+        self.transcriber_factory = transcriber_factory
+        self.prefetcher = prefetcher
+        self.store = store or JobStore(':memory:')
+        self.workers = max(1, int(workers))
+        self.log_callback = log_callback or (lambda message: logger.info(message.rstrip()))
+        self.status_callback = status_callback
+        self.idle_callback = idle_callback
+        self.progress = {}
+        self.transcribers = []
+        self.active = 0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.stop_flag = threading.Event()
+
+    def submit(self, audio_file, lang, beam_size, model, priority=0):
+        with self.lock:
+            if not self.store.add(audio_file, lang, beam_size, model, priority):
+                return False
+            self.progress.pop(audio_file, None)
+        self._report(audio_file, QUEUED)
+        self.start()
+        return True
+
+    def start(self):
+        # Starts workers for whatever the store has waiting, e.g. jobs recovered
+        # after a crash
+        self.stop_flag.clear()
+        self._prefetch()
+        self._spawn_workers()
+
+    def _prefetch(self):
+        if self.prefetcher:
+            self.prefetcher.schedule(self.store.pending_jobs())
+
+    def set_priority(self, audio_file, priority):
+        self.store.set_priority(audio_file, priority)
+        with self.lock:
+            running = self.active > 0
+        if running:
+            self._prefetch()
+
+    def set_workers(self, workers):
+        self.workers = max(1, int(workers))
+        self._spawn_workers()
+
+    def _spawn_workers(self):
+        with self.lock:
+            self.changed.notify_all()
+            while self.active < min(self.workers, len(self.store.pending())):
+                self.active += 1
+                threading.Thread(target=self._worker, daemon=True).start()
+
+    def _worker(self):
+        transcriber = self.transcriber_factory()
+        with self.lock:
+            self.transcribers.append(transcriber)
+        try:
+            while not self.stop_flag.is_set():
+                # Taking a job and retiring the worker happen under the same lock
+                # as submit(), so a job can never be left without a worker.
+                with self.lock:
+                    job = self.store.claim()
+                    if job is None:
+                        delay = self.store.next_due()
+                        if delay is None:
+                            break
+                        # Only retries are waiting; sleep until the first is due
+                        self.changed.wait(delay)
+                        continue
+                self._report(job.audio_file, RUNNING)
+                self._run_job(transcriber, job)
+        finally:
+            with self.lock:
+                self.transcribers.remove(transcriber)
+                self.active -= 1
+                idle = self.active == 0
+                self.changed.notify_all()
+            if idle and self.idle_callback:
+                self.idle_callback()
+
+    def _run_job(self, transcriber, job):
+        transcriber.model = job.model
+
+        def report_progress(percent, realtime_factor):
+            with self.lock:
+                self.progress[job.audio_file] = (percent, realtime_factor)
+
+        error = None
+        try:
+            input_file = self.prefetcher.take(job.audio_file) if self.prefetcher else None
+            succeeded = transcriber.transcribe_and_write_srt_live(job.audio_file, self.log_callback, job.lang, job.beam_size, report_progress, input_file)
+        except Exception as e:
+            logger.exception("Transcription of %s crashed", job.audio_file)
+            self.log_callback(f"Error transcribing {job.audio_file}: {str(e)}\n")
+            succeeded = False
+            error = str(e)
+
+        if transcriber.stop_flag.is_set():
+            status = STOPPED
+        else:
+            status = DONE if succeeded else FAILED
+        status = self.store.finish(job, status, error)
+        if status == RETRYING:
+            delay = self.store.backoff(job.attempts)
+            self.log_callback(f"Attempt {job.attempts} for {job.audio_file} failed, retrying in {delay:.0f}s\n")
+            with self.lock:
+                self.progress.pop(job.audio_file, None)
+            self._prefetch()
+        self._report(job.audio_file, status)
+
+    def _report(self, audio_file, status):
+        if self.status_callback:
+            self.status_callback(audio_file, status)
+
+    def snapshot(self):
+        return self.store.states()
+
+    def progress_snapshot(self):
+        # {audio_file: (percent, realtime_factor)} for files that reported progress
+        with self.lock:
+            return dict(self.progress)
+
+    def forget(self, audio_file):
+        if self.store.remove(audio_file):
+            with self.lock:
+                self.progress.pop(audio_file, None)
+                running = self.active > 0
+            if running:
+                # Lets the prefetcher drop anything it extracted for the file
+                self._prefetch()
+
+    def clear_finished(self):
+        self.store.clear_finished()
+        with self.lock:
+            self.progress.clear()
+
+    def is_busy(self):
+        with self.lock:
+            return self.active > 0 or bool(self.store.pending())
+
+    def wait(self):
+        with self.lock:
+            while self.active > 0:
+                self.changed.wait(0.5)
+
+    def stop(self):
+        self.stop_flag.set()
+        if self.prefetcher:
+            self.prefetcher.clear()
+        with self.lock:
+            stopped = self.store.stop_pending()
+            for transcriber in self.transcribers:
+                transcriber.stop_flag.set()
+            self.changed.notify_all()
+        for audio_file in stopped:
+            self._report(audio_file, STOPPED)
+        self.wait()
@@ -0,0 +1,104 @@
+import re
+import time
+from collections import namedtuple
+
+# Faster-Whisper verbose output: "[mm:ss.mmm --> mm:ss.mmm] text", with an
+# optional hour field once the audio runs past the first hour.
+SEGMENT_REGEX = re.compile(r'^\[(?:(\d+):)?(\d+):(\d{2})\.(\d{3}) --> (?:(\d+):)?(\d+):(\d{2})\.(\d{3})\] (.+)$')
+
+# Timing line of an SRT block as written by format_srt_block
+SRT_TIMING_REGEX = re.compile(r'^(\d+):(\d{2}):(\d{2}),(\d{3}) --> (\d+):(\d{2}):(\d{2}),(\d{3})$')
+
+# Timestamps are kept as integer milliseconds so no rounding can creep in
+Segment = namedtuple('Segment', ['start_ms', 'end_ms', 'text'])
+
+
+def parse_segment_line(line):
+    match = SEGMENT_REGEX.match(line)
+    if not match:
+        return None
+    h1, m1, s1, ms1, h2, m2, s2, ms2, text = match.groups()
+    start_ms = ((int(h1) * 60 if h1 else 0) + int(m1)) * 60000 + int(s1) * 1000 + int(ms1)
+    end_ms = ((int(h2) * 60 if h2 else 0) + int(m2)) * 60000 + int(s2) * 1000 + int(ms2)
+    return Segment(start_ms, end_ms, text.strip())
+
+
+def format_srt_timestamp(ms):
+    return '%02d:%02d:%02d,%03d' % (ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000)
+
+
+def format_srt_block(index, segment):
+    return '%d\n%s --> %s\n%s\n\n' % (index, format_srt_timestamp(segment.start_ms), format_srt_timestamp(segment.end_ms), segment.text)
+
+
+def parse_srt_timestamp_ms(hours, minutes, seconds, milliseconds):
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(milliseconds)
+
+
+def read_complete_segments(file_path):
+    # Reads the blocks of a partial SRT written by SrtWriter. Returns the
+    # segments and the byte length of the complete blocks, so a block cut off
+    # by a crash can be truncated away before appending to the file.
+    with open(file_path, 'rb') as f:
+        data = f.read()
+
+    segments = []
+    size = 0
+    while True:
+        end = data.find(b'\n\n', size)
+        if end < 0:
+            break
+        lines = data[size:end].decode('utf-8', errors='replace').split('\n')
+        match = SRT_TIMING_REGEX.match(lines[1]) if len(lines) >= 3 else None
+        if not match:
+            break
+        groups = match.groups()
+        segments.append(Segment(parse_srt_timestamp_ms(*groups[:4]), parse_srt_timestamp_ms(*groups[4:]), '\n'.join(lines[2:])))
+        size = end + 2
+    return segments, size
+
+
+class SrtWriter:
+    # Buffers SRT blocks and writes them out in batches. The file is flushed
+    # every `flush_every` segments or `flush_interval` seconds, whichever comes
+    # first, so the partial file stays reasonably fresh without a flush per line.
+    # offset_ms shifts every segment, for output that starts partway into the audio.
+    def __init__(self, file_path, start_index=1, mode='w', offset_ms=0, flush_every=32, flush_interval=1.0):
+        self.file_path = file_path
+        self.index = start_index
+        self.offset_ms = offset_ms
+        self.mode = mode
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.file = None
+        self.last_flush = 0.0
+
+    def __enter__(self):
+        self.file = open(self.file_path, self.mode, encoding='utf-8', newline='')
+        self.last_flush = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, segment):
+        if self.offset_ms:
+            segment = Segment(segment.start_ms + self.offset_ms, segment.end_ms + self.offset_ms, segment.text)
+        self.buffer.append(format_srt_block(self.index, segment))
+        self.index += 1
+        if len(self.buffer) >= self.flush_every or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(''.join(self.buffer))
+            self.buffer.clear()
+        self.file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.file = None
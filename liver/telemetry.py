@@ -0,0 +1,300 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from cache import default_cache_dir
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# How often a running Faster-Whisper process has its memory sampled
+RSS_SAMPLE_INTERVAL = 0.5
+
+
+def default_telemetry_path():
+    return os.path.join(default_cache_dir('telemetry'), 'jobs.jsonl')
+
+
+def read_peak_rss(pid):
+    # Peak resident memory of pid in bytes so far, or None if it cannot be read
+    if psutil:
+        try:
+            info = psutil.Process(pid).memory_info()
+        except (psutil.Error, OSError):
+            return None
+        return getattr(info, 'peak_wset', None) or info.rss
+    if sys.platform == 'win32':
+        return read_peak_working_set(pid)
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def read_peak_working_set(pid):
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        return None
+    try:
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        if not kernel32.K32GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+class RssSampler:
+    # Polls a child process for its peak memory until stop() is called.
+    # Sampling keeps the highest value seen, since the figure is gone once the
+    # process has exited.
+    def __init__(self, pid, interval=RSS_SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            self.peak = max(self.peak, read_peak_rss(self.pid) or 0)
+            if self.stopped.wait(self.interval):
+                return
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        return self.peak
+
+
+class JobTelemetry:
+    # Timings for one transcription job. A job may run several Faster-Whisper
+    # processes (chunks), possibly at once, so every hook is thread-safe.
+    # Times are relative to the first transcription start, so probing and
+    # cache lookups before it do not count.
+    def __init__(self, audio_file, model, lang, beam_size, device, threads, backend):
+        self.audio_file = audio_file
+        self.model = model
+        self.lang = lang
+        self.beam_size = beam_size
+        self.device = device
+        self.threads = threads
+        self.backend = backend
+        self.mode = None
+        self.audio_ms = None
+        self.started = None
+        self.spawn_s = None
+        self.first_segment_s = None
+        self.segments = 0
+        self.processes = 0
+        self.peak_rss = 0
+        self.samplers = {}
+        self.lock = threading.Lock()
+
+    def transcription_started(self):
+        # Returns the start time to pass to process_started
+        now = time.monotonic()
+        with self.lock:
+            if self.started is None:
+                self.started = now
+        return now
+
+    def process_started(self, pid, spawn_requested):
+        now = time.monotonic()
+        with self.lock:
+            self.processes += 1
+            if self.spawn_s is None:
+                self.spawn_s = now - spawn_requested
+            self.samplers[pid] = RssSampler(pid)
+
+    def process_finished(self, pid):
+        with self.lock:
+            sampler = self.samplers.pop(pid, None)
+        if sampler:
+            peak = sampler.stop()
+            with self.lock:
+                self.peak_rss = max(self.peak_rss, peak)
+
+    def segment(self):
+        with self.lock:
+            self.segments += 1
+            if self.first_segment_s is None and self.started is not None:
+                self.first_segment_s = time.monotonic() - self.started
+
+    def finish(self, status):
+        for pid in list(self.samplers):
+            self.process_finished(pid)
+        wall_s = time.monotonic() - self.started if self.started is not None else None
+        audio_s = self.audio_ms / 1000.0 if self.audio_ms else None
+        return {
+            'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'audio_file': self.audio_file,
+            'model': self.model,
+            'lang': self.lang,
+            'beam_size': str(self.beam_size),
+            'device': self.device,
+            'threads': self.threads,
+            'backend': self.backend,
+            'mode': self.mode,
+            'status': status,
+            'processes': self.processes,
+            'spawn_s': round(self.spawn_s, 3) if self.spawn_s is not None else None,
+            'first_segment_s': round(self.first_segment_s, 3) if self.first_segment_s is not None else None,
+            'wall_s': round(wall_s, 3) if wall_s is not None else None,
+            'segments': self.segments,
+            'segments_per_s': round(self.segments / wall_s, 3) if wall_s else None,
+            'audio_s': audio_s,
+            'audio_s_per_wall_s': round(audio_s / wall_s, 3) if audio_s and wall_s else None,
+            'peak_rss_bytes': self.peak_rss or None,
+        }
+
+
+class TelemetryLog:
+    # Appends one JSON line per finished job and, optionally, keeps a
+    # Prometheus text file up to date for the node exporter's textfile
+    # collector. Shared by all workers.
+    def __init__(self, path=None, prometheus_path=None):
+        self.path = path or default_telemetry_path()
+        self.prometheus_path = prometheus_path
+        self.lock = threading.Lock()
+        self.jobs = defaultdict(int)
+        self.totals = defaultdict(float)
+        self.last = {}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            if self.prometheus_path:
+                self.update_prometheus(record)
+
+    def update_prometheus(self, record):
+        labels = (record['model'], record['beam_size'])
+        self.jobs[labels + (record['status'],)] += 1
+        if record['status'] == 'done':
+            self.totals[labels + ('audio_seconds',)] += record['audio_s'] or 0
+            self.totals[labels + ('wall_seconds',)] += record['wall_s'] or 0
+            self.totals[labels + ('segments',)] += record['segments']
+            self.last[labels] = record
+
+        lines = [
+            '# HELP liver_jobs_total Finished transcription jobs by outcome',
+            '# TYPE liver_jobs_total counter',
+        ]
+        for (model, beam_size, status), count in sorted(self.jobs.items()):
+            lines.append(f'liver_jobs_total{{model="{model}",beam_size="{beam_size}",status="{status}"}} {count}')
+        for name, help_text in (
+            ('audio_seconds', 'Audio transcribed by successful jobs'),
+            ('wall_seconds', 'Wall time spent on successful jobs'),
+            ('segments', 'Segments produced by successful jobs'),
+        ):
+            lines.append(f'# HELP liver_{name}_total {help_text}')
+            lines.append(f'# TYPE liver_{name}_total counter')
+            for (model, beam_size, key), value in sorted(self.totals.items()):
+                if key == name:
+                    lines.append(f'liver_{name}_total{{model="{model}",beam_size="{beam_size}"}} {value:g}')
+        for field, name, help_text in (
+            ('spawn_s', 'last_spawn_seconds', 'Process start-up time of the last successful job'),
+            ('first_segment_s', 'last_first_segment_seconds', 'Time to first segment of the last successful job'),
+            ('segments_per_s', 'last_segments_per_second', 'Segment rate of the last successful job'),
+            ('audio_s_per_wall_s', 'last_realtime_factor', 'Audio seconds per wall second of the last successful job'),
+            ('peak_rss_bytes', 'last_peak_rss_bytes', 'Peak Faster-Whisper memory of the last successful job'),
+        ):
+            lines.append(f'# HELP liver_{name} {help_text}')
+            lines.append(f'# TYPE liver_{name} gauge')
+            for (model, beam_size), last in sorted(self.last.items()):
+                if last[field] is not None:
+                    lines.append(f'liver_{name}{{model="{model}",beam_size="{beam_size}"}} {last[field]:g}')
+
+        # The collector may read at any moment, so the file is replaced whole
+        directory = os.path.dirname(os.path.abspath(self.prometheus_path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.liver-', suffix='.prom', dir=directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.prometheus_path)
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def summarize(records):
+    # Medians per model and beam size over successful jobs
+    groups = defaultdict(list)
+    for record in records:
+        if record['status'] == 'done':
+            groups[(record['model'], record['beam_size'])].append(record)
+
+    def median(group, field):
+        values = [record[field] for record in group if record[field] is not None]
+        return statistics.median(values) if values else None
+
+    rows = []
+    for (model, beam_size), group in sorted(groups.items()):
+        rows.append({
+            'model': model,
+            'beam_size': beam_size,
+            'jobs': len(group),
+            'spawn_s': median(group, 'spawn_s'),
+            'first_segment_s': median(group, 'first_segment_s'),
+            'segments_per_s': median(group, 'segments_per_s'),
+            'audio_s_per_wall_s': median(group, 'audio_s_per_wall_s'),
+            'peak_rss_mb': (median(group, 'peak_rss_bytes') or 0) / (1 << 20) or None,
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize liver job telemetry per model and beam size")
+    parser.add_argument('path', nargs='?', default=default_telemetry_path())
+    args = parser.parse_args(argv)
+
+    columns = ['model', 'beam_size', 'jobs', 'spawn_s', 'first_segment_s', 'segments_per_s', 'audio_s_per_wall_s', 'peak_rss_mb']
+    print('\t'.join(columns))
+    for row in summarize(read_records(args.path)):
+        print('\t'.join('-' if row[column] is None else f'{row[column]:.2f}' if isinstance(row[column], float) else str(row[column]) for column in columns))
+
+
+if __name__ == '__main__':
+    main()
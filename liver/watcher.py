@@ -0,0 +1,95 @@
+import logging
+import os
+import threading
+import time
+
+from media import MEDIA_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCAN_INTERVAL = 5.0
+# A file counts as complete once its size and mtime have not changed for this long
+DEFAULT_SETTLE_SECONDS = 15.0
+
+
+class FolderWatcher:
+    # Polls directories for media files and hands each one to on_file once it
+    # has stopped growing. Polling rather than change notifications, since
+    # the folders are often network shares where those are unreliable.
+    # should_skip(path) lets the caller drop files it has already handled,
+    # e.g. ones with a finished SRT next to them.
+    def __init__(self, directories, on_file, should_skip=None, recursive=False,
+                 interval=DEFAULT_SCAN_INTERVAL, settle_seconds=DEFAULT_SETTLE_SECONDS, log_callback=None):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.on_file = on_file
+        self.should_skip = should_skip or (lambda path: False)
+        self.recursive = recursive
+        self.interval = interval
+        self.settle_seconds = settle_seconds
+        self.log_callback = log_callback or (lambda message: logger.info(message.rstrip()))
+        # path -> (size, mtime, unchanged since) for files still settling
+        self.settling = {}
+        # path -> (size, mtime) of files already handed over
+        self.dispatched = {}
+        self.stop_flag = threading.Event()
+
+    def media_files(self, directory):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            self.log_callback(f"Cannot scan {directory}: {str(e)}\n")
+            return
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir():
+                    if self.recursive:
+                        yield from self.media_files(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in MEDIA_EXTENSIONS:
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
+            except OSError:
+                # Deleted or renamed between listing and stat
+                continue
+
+    def scan(self):
+        # One pass over every directory; returns the files handed to on_file
+        now = time.monotonic()
+        seen = set()
+        ready = []
+        for directory in self.directories:
+            for path, size, mtime in self.media_files(directory):
+                seen.add(path)
+                if self.dispatched.get(path) == (size, mtime):
+                    continue
+                previous = self.settling.get(path)
+                if previous is None or previous[:2] != (size, mtime):
+                    self.settling[path] = (size, mtime, now)
+                elif size and now - previous[2] >= self.settle_seconds:
+                    del self.settling[path]
+                    self.dispatched[path] = (size, mtime)
+                    if not self.should_skip(path):
+                        ready.append(path)
+
+        # Forget files that disappeared, so a new recording under the same name counts
+        for path in list(self.settling):
+            if path not in seen:
+                del self.settling[path]
+        for path in list(self.dispatched):
+            if path not in seen:
+                del self.dispatched[path]
+
+        for path in sorted(ready):
+            self.log_callback(f"New file in watched folder: {path}\n")
+            self.on_file(path)
+        return ready
+
+    def run(self):
+        self.log_callback(f"Watching {', '.join(self.directories)} for new media\n")
+        while not self.stop_flag.is_set():
+            self.scan()
+            self.stop_flag.wait(self.interval)
+
+    def stop(self):
+        self.stop_flag.set()
@@ -0,0 +1,390 @@
+import argparse
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import secrets
+import select
+import socket
+import threading
+import time
+
+from cache import default_cache_dir
+from segments import Segment
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = ('127.0.0.1', 9137)
+KEY_ENV = 'LIVER_SERVER_KEY'
+
+# How often a client waiting for segments checks its stop flag
+POLL_INTERVAL = 0.1
+# Longest message either side accepts; segments are a line of text
+MAX_MESSAGE_BYTES = 1 << 20
+HANDSHAKE_TIMEOUT = 10
+
+
+# The server runs the faster-whisper Python package, not Faster-Whisper-XXL.
+# The XXL-only options a local run passes (the silero_v4 VAD, --standard_asia)
+# do not exist there and the cantonese model cannot be loaded, so the server
+# refuses that model, and its transcripts are cached apart from local ones
+# under the backend identity it reports in the handshake.
+
+# Protocol: one JSON object or array per line over TCP. Nothing is ever
+# unpickled, so a peer can at worst send a bad request.
+#   client -> {'type': 'hello', 'key'}, server -> ['ok', backend identity] or closes
+#   client -> {'type': 'transcribe', 'audio_file', 'lang', 'beam_size', 'model'}
+#   server -> ['segment', start_ms, end_ms, text] ... then ['done'] or ['error', message]
+#   client -> {'type': 'cancel'} at any time while a job runs
+#   client -> {'type': 'ping'}, server -> ['pong', [loaded models]]
+
+
+def default_key_path():
+    return os.path.join(default_cache_dir('server'), 'server.key')
+
+
+def load_key(path=None, create=False):
+    # The shared secret: LIVER_SERVER_KEY if set, else a random key kept in a
+    # file only this user can read. The server creates it; clients on the
+    # same account read it.
+    if os.environ.get(KEY_ENV):
+        return os.environ[KEY_ENV]
+    path = path or default_key_path()
+    try:
+        with open(path, 'r', encoding='ascii') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        if not create:
+            raise RuntimeError(f"No transcription server key: set {KEY_ENV} or start the server once to create {path}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    key = secrets.token_hex(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='ascii') as f:
+        f.write(key + '\n')
+    return key
+
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class JsonConnection:
+    # Newline-delimited JSON over a socket, with poll() like a
+    # multiprocessing Connection
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = b''
+        self.closed = False
+
+    def send(self, message):
+        self.sock.sendall(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+
+    def fill(self):
+        data = self.sock.recv(65536)
+        if not data:
+            self.closed = True
+            return
+        self.buffer += data
+        if b'\n' not in self.buffer and len(self.buffer) > MAX_MESSAGE_BYTES:
+            raise OSError("Message too long")
+
+    def poll(self, timeout=0.0):
+        if b'\n' in self.buffer or self.closed:
+            return True
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        if readable:
+            self.fill()
+        return b'\n' in self.buffer or self.closed
+
+    def recv(self):
+        while b'\n' not in self.buffer:
+            if self.closed:
+                raise EOFError
+            self.fill()
+        line, _, self.buffer = self.buffer.partition(b'\n')
+        try:
+            return json.loads(line)
+        except ValueError:
+            raise OSError("Malformed message")
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# A backend keeps one model loaded between jobs: load() runs once per model,
+# then transcribe(audio_file, lang, beam_size, emit, should_stop) is called
+# for every job, reports segments through emit and returns False if
+# should_stop() asked it to give up early. identity names the backend and
+# every option that changes its output, for the transcript cache.
+class FasterWhisperBackend:
+    name = 'faster-whisper'
+    identity = 'faster-whisper|best_of=10|vad_filter=silero'
+    # Only Faster-Whisper-XXL ships these
+    unsupported_models = ('cantonese',)
+
+    def __init__(self, model, device='cuda', threads=0):
+        if model in self.unsupported_models:
+            raise RuntimeError(f"The {model} model needs Faster-Whisper-XXL; transcribe it without the server")
+        self.model = model
+        self.device = device
+        self.threads = threads
+
+    def load(self):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("The faster-whisper backend needs the faster-whisper package (pip install faster-whisper)")
+        self.whisper = WhisperModel(self.model, device=self.device.lower(), cpu_threads=self.threads)
+
+    def transcribe(self, audio_file, lang, beam_size, emit, should_stop):
+        segments, _ = self.whisper.transcribe(
+            audio_file,
+            language=lang or None,
+            task='transcribe',
+            beam_size=int(beam_size),
+            best_of=10,
+            vad_filter=True,
+        )
+        for segment in segments:
+            if should_stop():
+                return False
+            emit(Segment(int(round(segment.start * 1000)), int(round(segment.end * 1000)), segment.text.strip()))
+        return True
+
+
+class FakeBackend:
+    # Local stand-in for tests and benchmarks: no model, just evenly spaced
+    # segments after an optional load delay.
+    name = 'fake'
+    identity = 'fake'
+
+    def __init__(self, model, device='cpu', threads=0, segments=20, segment_ms=2000, segment_interval=0.0, load_delay=0.0):
+        self.model = model
+        self.device = device
+        self.threads = threads
+        self.segments = segments
+        self.segment_ms = segment_ms
+        self.segment_interval = segment_interval
+        self.load_delay = load_delay
+
+    def load(self):
+        time.sleep(self.load_delay)
+
+    def transcribe(self, audio_file, lang, beam_size, emit, should_stop):
+        for i in range(self.segments):
+            if should_stop():
+                return False
+            if self.segment_interval:
+                time.sleep(self.segment_interval)
+            emit(Segment(i * self.segment_ms, (i + 1) * self.segment_ms, f"{os.path.basename(audio_file)} {i}"))
+        return True
+
+
+BACKENDS = {
+    FasterWhisperBackend.name: FasterWhisperBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+class TranscriptionServer:
+    # Keeps one loaded backend per model and serves jobs over local IPC. Jobs
+    # for the same model run one at a time; the model never reloads.
+    # key defaults to load_key(create=True); listening beyond loopback needs
+    # one given explicitly (or through LIVER_SERVER_KEY). identity is the
+    # backend's, passed on to clients for their cache keys.
+    def __init__(self, backend_factory, address=DEFAULT_ADDRESS, key=None, identity='unknown'):
+        if not is_loopback(address[0]) and not (key or os.environ.get(KEY_ENV)):
+            raise ValueError(f"Refusing to listen on {address[0]} without an explicit key (set {KEY_ENV})")
+        self.backend_factory = backend_factory
+        self.identity = identity
+        self.address = address
+        self.key = key or load_key(create=True)
+        self.backends = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.listener = None
+
+    def backend(self, model):
+        with self.lock:
+            if model not in self.locks:
+                self.locks[model] = threading.Lock()
+            model_lock = self.locks[model]
+        with model_lock:
+            if model not in self.backends:
+                backend = self.backend_factory(model)
+                started = time.monotonic()
+                backend.load()
+                logger.info("Loaded %s model %s in %.1fs", backend.name, model, time.monotonic() - started)
+                self.backends[model] = backend
+        return self.backends[model], model_lock
+
+    def serve_forever(self):
+        self.listener = socket.create_server(self.address)
+        self.address = self.listener.getsockname()[:2]
+        logger.info("Transcription server listening on %s:%s", *self.address)
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=self.handle, args=(JsonConnection(sock),), daemon=True).start()
+
+    def close(self):
+        if self.listener:
+            self.listener.close()
+
+    def authenticate(self, conn):
+        conn.sock.settimeout(HANDSHAKE_TIMEOUT)
+        try:
+            hello = conn.recv()
+        except (EOFError, OSError):
+            return False
+        conn.sock.settimeout(None)
+        key = hello.get('key') if isinstance(hello, dict) else None
+        if not isinstance(key, str) or not hmac.compare_digest(key.encode(), self.key.encode()):
+            logger.warning("Rejected a client with a wrong key")
+            return False
+        conn.send(['ok', self.identity])
+        return True
+
+    def handle(self, conn):
+        with conn:
+            if not self.authenticate(conn):
+                return
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if not isinstance(request, dict):
+                    return
+                if request.get('type') == 'ping':
+                    conn.send(['pong', sorted(self.backends)])
+                elif request.get('type') == 'transcribe':
+                    self.run_job(conn, request)
+
+    def run_job(self, conn, request):
+        cancelled = False
+
+        def should_stop():
+            nonlocal cancelled
+            while not cancelled and conn.poll():
+                message = conn.recv()
+                if isinstance(message, dict) and message.get('type') == 'cancel':
+                    cancelled = True
+            return cancelled
+
+        def emit(segment):
+            conn.send(['segment', segment.start_ms, segment.end_ms, segment.text])
+
+        try:
+            backend, model_lock = self.backend(request['model'])
+            with model_lock:
+                finished = backend.transcribe(request['audio_file'], request['lang'], request['beam_size'], emit, should_stop)
+            conn.send(['done'] if finished else ['error', 'cancelled'])
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            logger.exception("Job for %s failed", request.get('audio_file'))
+            conn.send(['error', str(e)])
+
+
+class TranscriptionServerClient:
+    # key defaults to LIVER_SERVER_KEY or the key file the server wrote
+    def __init__(self, address=DEFAULT_ADDRESS, key=None):
+        self.address = address
+        self.key = key
+        self.identity = None
+
+    def connect(self):
+        key = self.key or load_key()
+        conn = JsonConnection(socket.create_connection(self.address, timeout=HANDSHAKE_TIMEOUT))
+        try:
+            conn.send({'type': 'hello', 'key': key})
+            reply = conn.recv()
+            if not isinstance(reply, list) or len(reply) != 2 or reply[0] != 'ok':
+                raise OSError("Transcription server rejected the handshake")
+            self.identity = str(reply[1])
+        except EOFError:
+            conn.close()
+            raise OSError("Transcription server rejected the key")
+        except BaseException:
+            conn.close()
+            raise
+        conn.sock.settimeout(None)
+        return conn
+
+    def backend_identity(self):
+        # The server's backend and options, asked once; raises OSError if it
+        # cannot be reached
+        if self.identity is None:
+            self.connect().close()
+        return self.identity
+
+    def transcribe(self, audio_file, lang, beam_size, model, on_segment, stop_flag=None):
+        # Streams segments to on_segment as the server produces them. Returns
+        # True when the job finished, False if it was stopped; raises
+        # RuntimeError for server-side failures and OSError if unreachable.
+        with self.connect() as conn:
+            conn.send({'type': 'transcribe', 'audio_file': audio_file, 'lang': lang, 'beam_size': beam_size, 'model': model})
+            cancelled = False
+            while True:
+                if not cancelled and stop_flag is not None and stop_flag.is_set():
+                    conn.send({'type': 'cancel'})
+                    cancelled = True
+                if not conn.poll(POLL_INTERVAL):
+                    continue
+                message = conn.recv()
+                if message[0] == 'segment':
+                    on_segment(Segment(message[1], message[2], message[3]))
+                elif message[0] == 'done':
+                    return True
+                elif cancelled:
+                    return False
+                else:
+                    raise RuntimeError(message[1])
+
+
+def parse_address(value):
+    host, _, port = value.rpartition(':')
+    return (host or DEFAULT_ADDRESS[0], int(port))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm-model transcription server for liver")
+    parser.add_argument('--address', type=parse_address, default=DEFAULT_ADDRESS, help="host:port to listen on")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=FasterWhisperBackend.name)
+    parser.add_argument('--device', default='cuda')
+    parser.add_argument('--threads', type=int, default=0)
+    parser.add_argument('--preload', nargs='*', default=['large-v3'], help="Models loaded before the first job")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    backend_class = BACKENDS[args.backend]
+
+    def backend_factory(model):
+        return backend_class(model, device=args.device, threads=args.threads)
+
+    try:
+        server = TranscriptionServer(backend_factory, args.address, identity=backend_class.identity)
+    except ValueError as e:
+        parser.error(str(e))
+    for model in args.preload:
+        server.backend(model)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
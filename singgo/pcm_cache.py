@@ -0,0 +1,152 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from playback import CHANNELS, FRAME_BYTES, SAMPLE_RATE, AudioPlayer, Decoder, PcmBuffer
+
+# A song is keyed on its size plus HASH_SAMPLES blocks of HASH_SAMPLE_SIZE
+# spread over it, as liver keys its media
+HASH_SAMPLE_SIZE = 1 << 20
+HASH_SAMPLES = 8
+# About eight hours of 44.1 kHz stereo; least recently played songs go first
+DEFAULT_CACHE_SIZE = 5 << 30
+
+
+def default_cache_dir():
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'singgo', 'pcm')
+
+
+def file_digest(path):
+    # Reads at most 8 MB whatever the file's size, so opening a long
+    # recording on the UI thread does not stall it
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=20)
+    with open(path, 'rb') as file:
+        if size <= HASH_SAMPLE_SIZE * HASH_SAMPLES:
+            digest.update(file.read())
+        else:
+            step = (size - HASH_SAMPLE_SIZE) // (HASH_SAMPLES - 1)
+            for i in range(HASH_SAMPLES):
+                file.seek(i * step)
+                digest.update(file.read(HASH_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def cache_path(audio_file, cache_dir=None):
+    # Keyed on the file's content, so a renamed or copied song still hits
+    # and an edited one does not
+    name = f"{file_digest(audio_file)}-{SAMPLE_RATE}-{CHANNELS}-s16le.pcm"
+    return os.path.join(cache_dir or default_cache_dir(), name)
+
+
+class MemmapSource:
+    # A decoded song opened straight from the PCM cache. frames is an
+    # (n, CHANNELS) int16 view of the mapping: slicing it copies nothing, and
+    # the OS pages in only what playback, scrubbing or analysis touches, so
+    # a seek costs no decode at all.
+    def __init__(self, path):
+        self.path = path
+        self.frames = np.memmap(path, dtype='<i2', mode='r').reshape(-1, CHANNELS)
+        self.complete = True
+        self.error = None
+
+    def frames_available(self):
+        return len(self.frames)
+
+    def total_frames(self):
+        return len(self.frames)
+
+    def read(self, frame, count):
+        # PyAudio takes bytes, so only the buffer handed to the device is copied
+        return self.frames[frame:frame + count].tobytes()
+
+    def samples(self, start_ms=0, end_ms=None):
+        # Zero-copy int16 view between two times, for waveforms and the like
+        start = start_ms * SAMPLE_RATE // 1000
+        end = None if end_ms is None else end_ms * SAMPLE_RATE // 1000
+        return self.frames[start:end]
+
+
+def evict_lru(directory, max_bytes):
+    # Drop the least recently played songs (by mtime) until the rest fit in
+    # max_bytes. Dot-files are decodes still being written and are left alone.
+    entries = []
+    total = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith('.pcm') and not entry.name.startswith('.'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            # Still mapped by a player on Windows; it goes on a later pass
+            pass
+
+
+class CacheWriter:
+    # Collects what a Decoder produces into a private temp file and renames
+    # it into place only when the decode finished cleanly, so an interrupted
+    # first load never leaves a truncated song behind and two players
+    # decoding the same song never write into each other's file. Finishing
+    # evicts old songs beyond max_bytes.
+    def __init__(self, path, max_bytes=DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        cache_dir = os.path.dirname(path)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, self.partial_path = tempfile.mkstemp(prefix='.', suffix='.partial', dir=cache_dir)
+        self.file = os.fdopen(fd, 'wb')
+
+    def append(self, chunk):
+        self.file.write(chunk)
+
+    def finish(self, error=None):
+        size = self.file.tell()
+        self.file.close()
+        if error is None and size >= FRAME_BYTES:
+            with open(self.partial_path, 'r+b') as file:
+                file.truncate(size - size % FRAME_BYTES)
+                os.fsync(file.fileno())
+            os.replace(self.partial_path, self.path)
+            evict_lru(os.path.dirname(self.path), self.max_bytes)
+        else:
+            os.remove(self.partial_path)
+
+
+def open_cached(audio_file, cache_dir=None):
+    # (MemmapSource, path) when the song was decoded before, else (None, path)
+    path = cache_path(audio_file, cache_dir)
+    if os.path.exists(path) and os.path.getsize(path) >= FRAME_BYTES:
+        source = MemmapSource(path)
+        # mtime doubles as the last-played time for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return source, path
+    return None, path
+
+
+def open_player(audio_file, cache_dir=None):
+    # A song decoded before plays straight from its mapping; otherwise it is
+    # decoded once, playing as it goes, and cached for next time
+    source, path = open_cached(audio_file, cache_dir)
+    if source is not None:
+        return AudioPlayer(source)
+    buffer = PcmBuffer()
+    try:
+        cache = CacheWriter(path)
+    except OSError:
+        cache = None
+    decoder = Decoder(audio_file, buffer, cache)
+    decoder.start()
+    return AudioPlayer(buffer, decoder)
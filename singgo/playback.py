@@ -0,0 +1,239 @@
+import threading
+
+import ffmpeg
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+SAMPLE_WIDTH = 2  # s16le
+FRAME_BYTES = CHANNELS * SAMPLE_WIDTH
+FRAMES_PER_BUFFER = 512  # ~12 ms at 44.1 kHz
+DECODE_CHUNK = 1 << 16
+BUFFER_CHUNK = 1 << 20  # a whole number of frames
+
+
+class PcmBuffer:
+    # Decoded PCM for the whole file, filled by the decoder thread while the
+    # output callback reads from any frame already decoded. A song is about
+    # 10 MB a minute at 44.1 kHz stereo, so it stays in memory and seeking
+    # anywhere already decoded needs no new decode. It is kept as a list of
+    # preallocated BUFFER_CHUNK blocks: the decoder copies into the space
+    # past size, which no reader looks at, and takes the lock only to publish
+    # the new size, so the callback never waits behind a large copy.
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+        self.lock = threading.Lock()
+        self.complete = False
+        self.error = None
+
+    def append(self, chunk):
+        # Only ever called from the decoder thread
+        view = memoryview(chunk)
+        size = self.size
+        new_chunks = []
+        while view:
+            offset = size % BUFFER_CHUNK
+            if offset == 0 and size // BUFFER_CHUNK >= len(self.chunks) + len(new_chunks):
+                new_chunks.append(bytearray(BUFFER_CHUNK))
+            blocks = self.chunks + new_chunks if new_chunks else self.chunks
+            block = blocks[size // BUFFER_CHUNK]
+            count = min(len(view), BUFFER_CHUNK - offset)
+            block[offset:offset + count] = view[:count]
+            view = view[count:]
+            size += count
+        with self.lock:
+            self.chunks.extend(new_chunks)
+            self.size = size
+
+    def finish(self, error=None):
+        with self.lock:
+            # Drop a torn trailing frame
+            self.size -= self.size % FRAME_BYTES
+            self.error = error
+            self.complete = True
+
+    def frames_available(self):
+        return self.size // FRAME_BYTES
+
+    def total_frames(self):
+        # None until the decoder has reached the end
+        return self.frames_available() if self.complete else None
+
+    def read(self, frame, count):
+        # Up to count frames from frame on; fewer if not decoded yet
+        with self.lock:
+            start = min(frame * FRAME_BYTES, self.size)
+            end = min((frame + count) * FRAME_BYTES, self.size)
+            pieces = []
+            while start < end:
+                block = self.chunks[start // BUFFER_CHUNK]
+                offset = start % BUFFER_CHUNK
+                piece = block[offset:offset + min(end - start, BUFFER_CHUNK - offset)]
+                pieces.append(piece)
+                start += len(piece)
+        return b''.join(pieces)
+
+
+class Decoder(threading.Thread):
+    # One ffmpeg process per file, decoding from the start straight into a
+    # PcmBuffer. It is never restarted: pausing, resuming and seeking only
+    # move the player's cursor over what it has produced. cache, if given,
+    # gets the same chunks (append/finish like PcmBuffer); if it fails, the
+    # decode carries on without it.
+    def __init__(self, audio_file, buffer, cache=None):
+        super().__init__(daemon=True)
+        self.audio_file = audio_file
+        self.buffer = buffer
+        self.cache = cache
+        self.process = None
+        self.stopped = False
+
+    def run(self):
+        error = None
+        try:
+            self.process = (
+                ffmpeg
+                .input(self.audio_file)
+                .output('pipe:', format='s16le', acodec='pcm_s16le', ac=CHANNELS, ar=str(SAMPLE_RATE))
+                .global_args('-nostdin', '-loglevel', 'error')
+                .run_async(pipe_stdout=True)
+            )
+            while not self.stopped:
+                chunk = self.process.stdout.read(DECODE_CHUNK)
+                if not chunk:
+                    break
+                self.buffer.append(chunk)
+                self.write_cache(chunk)
+            if self.stopped:
+                error = "Decoding stopped"
+            elif self.process.wait() != 0:
+                error = f"ffmpeg exited with code {self.process.returncode}"
+        except Exception as e:
+            error = str(e)
+        finally:
+            self.buffer.finish(error)
+            self.finish_cache(error)
+
+    def write_cache(self, chunk):
+        if self.cache:
+            try:
+                self.cache.append(chunk)
+            except OSError as e:
+                self.finish_cache(str(e))
+
+    def finish_cache(self, error):
+        cache, self.cache = self.cache, None
+        if cache:
+            try:
+                cache.finish(error)
+            except OSError:
+                pass
+
+    def stop(self):
+        self.stopped = True
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+
+
+class AudioPlayer:
+    # Plays a PCM source through one long-lived PyAudio callback stream,
+    # opened once per file. The position is the frame the DAC is outputting
+    # now, worked out from the stream clock and the timing PortAudio reports
+    # for each callback, so it is what is being heard rather than what was
+    # last written. Pause keeps the stream running on silence; seek moves the
+    # cursor. source needs frames_available(), total_frames() and
+    # read(frame, count), as PcmBuffer and pcm_cache.MemmapSource have.
+    def __init__(self, source, decoder=None):
+        import pyaudio
+        self.source = source
+        self.decoder = decoder
+        self.lock = threading.Lock()
+        self.cursor = 0           # next frame the callback hands out
+        self.playing = False
+        self.anchor_frame = 0     # first frame of the last buffer handed out
+        self.anchor_dac_time = None  # stream time that frame reaches the DAC
+        self.floor = 0            # where the last play or seek started
+        self.pa_continue = pyaudio.paContinue
+        self.audio = pyaudio.PyAudio()
+        self.stream = self.audio.open(format=pyaudio.paInt16, channels=CHANNELS, rate=SAMPLE_RATE, output=True,
+                                      frames_per_buffer=FRAMES_PER_BUFFER, stream_callback=self.callback, start=False)
+        self.stream.start_stream()
+
+    def callback(self, in_data, frame_count, time_info, status):
+        silence = b'\x00' * (frame_count * FRAME_BYTES)
+        with self.lock:
+            if not self.playing:
+                self.anchor_dac_time = None
+                return silence, self.pa_continue
+            data = self.source.read(self.cursor, frame_count)
+            total = self.source.total_frames()
+            if total is not None and self.cursor + len(data) // FRAME_BYTES >= total:
+                # End of the file: let this buffer play out, then stop
+                self.playing = False
+            self.anchor_frame = self.cursor
+            self.anchor_dac_time = time_info.get('output_buffer_dac_time') or None
+            self.cursor += len(data) // FRAME_BYTES
+            # Frames not decoded yet play as silence and are not counted
+            return data + silence[len(data):], self.pa_continue
+
+    def position_frames(self):
+        with self.lock:
+            if not self.playing or self.anchor_dac_time is None:
+                return self.cursor
+            anchor_frame, dac_time, cursor, floor = self.anchor_frame, self.anchor_dac_time, self.cursor, self.floor
+        try:
+            now = self.stream.get_time()
+        except OSError:
+            now = 0
+        if not now:
+            # Host APIs without stream timing: written frames minus the latency
+            return max(floor, cursor - int(self.stream.get_output_latency() * SAMPLE_RATE))
+        # Usually negative: the last buffer handed out is still queued
+        # behind the device latency, and the frames before it are playing
+        frame = anchor_frame + int((now - dac_time) * SAMPLE_RATE)
+        # Until the first buffer after a play or seek is heard, report
+        # where it starts
+        return max(floor, min(frame, cursor))
+
+    def position_ms(self):
+        return self.position_frames() * 1000 // SAMPLE_RATE
+
+    def duration_ms(self):
+        total = self.source.total_frames()
+        return None if total is None else total * 1000 // SAMPLE_RATE
+
+    def play(self):
+        with self.lock:
+            total = self.source.total_frames()
+            if total is not None and self.cursor >= total:
+                self.cursor = 0
+            self.floor = self.cursor
+            self.anchor_dac_time = None
+            self.playing = True
+
+    def pause(self):
+        # Resume picks up at the frame being heard when paused, not at the
+        # end of what was already queued for the device
+        position = self.position_frames()
+        with self.lock:
+            self.playing = False
+            self.cursor = self.floor = position
+            self.anchor_dac_time = None
+
+    def seek_ms(self, position_ms):
+        frame = max(0, int(position_ms) * SAMPLE_RATE // 1000)
+        total = self.source.total_frames()
+        if total is not None:
+            frame = min(frame, total)
+        with self.lock:
+            self.cursor = self.floor = frame
+            self.anchor_dac_time = None
+
+    def close(self):
+        with self.lock:
+            self.playing = False
+        if self.decoder:
+            self.decoder.stop()
+        self.stream.stop_stream()
+        self.stream.close()
+        self.audio.terminate()
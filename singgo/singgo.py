@@ -1,13 +1,13 @@
 import sys
 import os
-import subprocess
-import threading
-import ffmpeg
-import time
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QTableWidget, QTableWidgetItem, QHeaderView, QTextEdit, QSplitter, QLabel
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont
 
+from pcm_cache import open_player
+
+# Left/Right arrow seek step
+SEEK_STEP_MS = 5000
 
 
 class LRCGenerator(QWidget):
@@ -18,12 +18,7 @@ class LRCGenerator(QWidget):
         self.current_line = 0
         self.time_stamps = {}
         self.audio_file = None
-        self.is_playing = False
-        self.ffplay_process = None
-        self.start_time = 0
-        self.pause_time = 0
-        self.total_pause_time = 0
-        self.current_position = 0
+        self.player = None
 
     def initUI(self):
         layout = QVBoxLayout()
@@ -90,18 +85,32 @@ class LRCGenerator(QWidget):
     def load_audio(self):
         file_name, _ = QFileDialog.getOpenFileName(self, 'Open Audio File', '', 'Audio Files (*.mp3 *.wav *.ogg)')
         if file_name:
+            if self.player:
+                self.player.close()
+            # Decoded once into the PCM cache; later loads just map the file
+            self.player = open_player(file_name)
             self.audio_file = file_name
+            self.play_pause_btn.setText('Play')
             self.audio_file_label.setText(f"Loaded: {os.path.basename(file_name)}")
             print(f"Loaded audio file: {file_name}")
 
     def update_time(self):
-        if self.is_playing:
-            current_time = self.get_current_time() - self.start_time - self.total_pause_time + self.current_position
-            minutes, seconds = divmod(int(current_time / 1000), 60)
-            milliseconds = current_time % 1000
-            time_string = f"{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+        if self.player:
+            time_string = self.format_time(self.get_current_time())
             self.timer_display.setText(time_string)
             self.setWindowTitle(f'LRC Generator - {time_string}')
+            if not self.player.playing and self.play_pause_btn.text() == 'Pause':
+                # Played to the end
+                self.play_pause_btn.setText('Play')
+
+    def format_time(self, current_time):
+        minutes, seconds = divmod(int(current_time / 1000), 60)
+        milliseconds = current_time % 1000
+        return f"{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+    @property
+    def is_playing(self):
+        return bool(self.player and self.player.playing)
 
     def load_lyrics(self):
         text = self.lyrics_input.toPlainText()
@@ -126,70 +135,24 @@ class LRCGenerator(QWidget):
             print("No audio loaded. Please load an audio file first.")
             return
 
-        current_time = self.get_current_time()
-
         if self.is_playing:
-            self.stop_audio()
-            self.pause_time = current_time
-            self.is_playing = False
+            self.player.pause()
             self.play_pause_btn.setText('Play')
         else:
-            if self.pause_time > 0:
-                self.total_pause_time += current_time - self.pause_time
-
-            self.play_audio()
-            self.is_playing = True
+            self.player.play()
             self.play_pause_btn.setText('Pause')
 
-    def play_audio(self):
-        if self.ffplay_process:
-            self.ffplay_process.terminate()
-
-        start_position = self.current_position / 1000  # Convert to seconds
-
-        self.ffplay_process = (
-            ffmpeg
-            .input(self.audio_file, ss=start_position)
-            .output('pipe:', format='s16le', acodec='pcm_s16le', ac=2, ar='44100')
-            .run_async(pipe_stdout=True, pipe_stderr=True)
-        )
-
-        def audio_playback():
-            import pyaudio
-            p = pyaudio.PyAudio()
-            stream = p.open(format=pyaudio.paInt16,
-                            channels=2,
-                            rate=44100,
-                            output=True)
-
-            while self.is_playing:
-                raw_data = self.ffplay_process.stdout.read(4096)
-                if not raw_data:
-                    break
-                stream.write(raw_data)
-
-            stream.stop_stream()
-            stream.close()
-            p.terminate()
-
-        threading.Thread(target=audio_playback, daemon=True).start()
-        self.start_time = self.get_current_time()
-
-    def stop_audio(self):
-        if self.ffplay_process:
-            self.ffplay_process.terminate()
-            self.ffplay_process = None
-        self.current_position += self.get_current_time() - self.start_time - self.total_pause_time
+    def seek(self, offset_ms):
+        if self.player:
+            self.player.seek_ms(self.player.position_ms() + offset_ms)
 
     def get_current_time(self):
-        return int(time.time() * 1000)
+        # Milliseconds into the song, counted in frames the sound card has played
+        return self.player.position_ms() if self.player else 0
 
     def next_line(self):
         if self.current_line < len(self.lyrics) and self.is_playing:
-            current_time = self.get_current_time() - self.start_time - self.total_pause_time
-            minutes, seconds = divmod(int(current_time / 1000), 60)
-            milliseconds = current_time % 1000
-            time_string = f"[{minutes:02d}:{seconds:02d}.{milliseconds:03d}]"
+            time_string = f"[{self.format_time(self.get_current_time())}]"
             
             self.lyrics_table.item(self.current_line, 0).setText(time_string)
             self.current_line += 1
@@ -210,10 +173,14 @@ class LRCGenerator(QWidget):
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Space:
             self.next_line()
+        elif event.key() == Qt.Key_Left:
+            self.seek(-SEEK_STEP_MS)
+        elif event.key() == Qt.Key_Right:
+            self.seek(SEEK_STEP_MS)
 
     def closeEvent(self, event):
-        if self.ffplay_process:
-            self.ffplay_process.terminate()
+        if self.player:
+            self.player.close()
         event.accept()
 
 if __name__ == '__main__':
@@ -0,0 +1,111 @@
+import json
+import os
+
+GOOGLE_TRANSLATE_URL = "https://translate.googleapis.com/translate_a/single"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# Codes offered in the language pickers; backends may accept more
+LANGUAGES = {
+    'yue': 'Cantonese',
+    'zh-CN': 'Chinese (Simplified)',
+    'zh-TW': 'Chinese (Traditional)',
+    'ja': 'Japanese',
+    'ko': 'Korean',
+    'en': 'English',
+    'id': 'Indonesian',
+}
+
+
+class BackendError(Exception):
+    # retry: whether the same request may succeed later (throttling, 5xx,
+    # network trouble); retry_after: seconds the service asked us to wait
+    def __init__(self, message, retry=False, retry_after=None):
+        super().__init__(message)
+        self.retry = retry
+        self.retry_after = retry_after
+
+
+class TranslationBackend:
+    # A translation service and what the engine may ask of it. Subclasses add
+    # request(session, text, source_lang, target_lang, timeout), which returns
+    # the translation or raises BackendError. max_batch_chars is 0 for
+    # services that cannot take several "[n]"-marked rows per request.
+    name = 'base'
+    max_batch_chars = 0
+    rate = 5.0
+    burst = 5
+    max_in_flight = 4
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def prepare(self, session):
+        # Called once with the engine's pooled session
+        pass
+
+    def check_response(self, response):
+        if response.status_code == 200:
+            return
+        retry_after = response.headers.get('Retry-After')
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None
+        raise BackendError(f"Translation request failed with status code: {response.status_code}",
+                           response.status_code in self.retry_statuses, retry_after)
+
+
+class GoogleGtxBackend(TranslationBackend):
+    # The free endpoint the Google Translate web widgets use
+    name = 'google'
+    max_batch_chars = 1000
+    rate = 10.0
+    burst = 10
+    max_in_flight = 8
+
+    def __init__(self, url=GOOGLE_TRANSLATE_URL):
+        self.url = url
+
+    def prepare(self, session):
+        session.headers['User-Agent'] = USER_AGENT
+
+    def request(self, session, text, source_lang, target_lang, timeout):
+        params = {
+            "client": "gtx",
+            "sl": source_lang,
+            "tl": target_lang,
+            "dt": "t",
+            "q": text
+        }
+        response = session.get(self.url, params=params, timeout=timeout)
+        self.check_response(response)
+        try:
+            result = json.loads(response.text)
+            return ''.join([sentence[0] for sentence in result[0]])
+        except (json.JSONDecodeError, TypeError, IndexError):
+            raise BackendError("Failed to decode JSON response")
+
+
+class MockBackend(GoogleGtxBackend):
+    # mock_server.py speaks the gtx protocol; no real service is rate limited
+    # behind it, so the engine may push as hard as the test asks
+    name = 'mock'
+    rate = 200.0
+    burst = 50
+    max_in_flight = 16
+
+    def __init__(self, url='http://127.0.0.1:8765/translate_a/single'):
+        super().__init__(url)
+
+
+BACKENDS = {
+    GoogleGtxBackend.name: GoogleGtxBackend,
+    MockBackend.name: MockBackend,
+}
+
+
+def create_backend(name=None, url=None):
+    # Defaults come from TRAYUE_BACKEND and TRAYUE_TRANSLATE_URL, so the app
+    # can be pointed at mock_server.py without code changes
+    name = name or os.environ.get('TRAYUE_BACKEND') or ('mock' if os.environ.get('TRAYUE_TRANSLATE_URL') else GoogleGtxBackend.name)
+    url = url or os.environ.get('TRAYUE_TRANSLATE_URL')
+    backend_class = BACKENDS[name]
+    return backend_class(url) if url else backend_class()
@@ -0,0 +1,178 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from backends import BACKENDS, LANGUAGES, create_backend
+from batching import DEFAULT_BATCH_CHARS
+from engine import SharedTokenBucket, TranslationEngine
+from glossary import Glossary, default_glossary_path
+from journal import TranslationJournal, journal_path
+from memory import TranslationMemory, default_memory_path
+from srt_output import translated_path
+from subtitle_reader import read_file
+
+# Headless trayue: translates every subtitle file under the given
+# directories or globs on a pool of worker processes. The workers share one
+# token bucket, so the whole run stays within a single request rate however
+# many there are. Output is named like the app's auto-save (episode.en.srt).
+#
+#   python batch_translate.py "Season 1" "extras/*.vtt" --target en --workers 4
+
+SUBTITLE_EXTENSIONS = ('.srt', '.vtt')
+
+# Set in each worker process by init_worker
+worker_engine = None
+
+
+def find_inputs(patterns, target_lang, recursive=False):
+    # Subtitle files named by patterns, skipping our own .<target>.srt output
+    found = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(glob.escape(pattern), '**', '*') if recursive else os.path.join(glob.escape(pattern), '*')
+        for path in sorted(glob.glob(pattern, recursive=recursive)):
+            if not os.path.isfile(path) or not path.lower().endswith(SUBTITLE_EXTENSIONS):
+                continue
+            if path.lower().endswith(f'.{target_lang.lower()}.srt'):
+                continue
+            key = os.path.normcase(os.path.abspath(path))
+            if key not in seen:
+                seen.add(key)
+                found.append(path)
+    return found
+
+
+def init_worker(backend_name, url, limiter, max_in_flight, memory_path, glossary_path):
+    global worker_engine
+    memory = TranslationMemory(memory_path) if memory_path else None
+    # Every worker compiles its own copy of the glossary
+    glossary = Glossary.load(glossary_path) if glossary_path else None
+    worker_engine = TranslationEngine(create_backend(backend_name, url), max_in_flight=max_in_flight, limiter=limiter, memory=memory, glossary=glossary)
+
+
+def translate_file(path, source_lang, target_lang, batch_chars):
+    # Runs in a worker; returns the stats main() adds up
+    started = time.perf_counter()
+    cues = list(read_file(path))
+    texts = [cue[3] for cue in cues]
+    translations = [''] * len(cues)
+    errors = []
+
+    # Rows journaled by an interrupted run are not requested again
+    journal = TranslationJournal(path, source_lang, target_lang)
+    for row, translated_text in journal.replay(texts).items():
+        translations[row] = translated_text
+    rows = [row for row, translated_text in enumerate(translations) if not translated_text]
+
+    def on_result(index, translated_text):
+        if translated_text.startswith("Error:"):
+            errors.append(translated_text)
+        else:
+            row = rows[index]
+            translations[row] = translated_text
+            if translated_text:
+                journal.append(row, texts[row], translated_text)
+
+    try:
+        failed = worker_engine.translate_rows([texts[row] for row in rows], source_lang, target_lang, on_result, batch_chars)
+    finally:
+        journal.close()
+    # Untranslated rows keep their original text, as in the app
+    output_path = journal.compact(((cue[1], cue[2], cue[3], translated_text) for cue, translated_text in zip(cues, translations)))
+    return {
+        'path': path,
+        'output': output_path,
+        'rows': len(cues),
+        'resumed': len(cues) - len(rows),
+        'chars': sum(len(text) for text in texts),
+        'failed': failed,
+        'error': errors[0] if errors else None,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Translate many SRT/WebVTT files without the GUI")
+    parser.add_argument('inputs', nargs='+', help="Directories, files or glob patterns")
+    parser.add_argument('--recursive', action='store_true', help="Also look in subdirectories (and let ** match them)")
+    parser.add_argument('--source', default='yue', help="Source language code (default: yue)")
+    parser.add_argument('--target', default='en', help="Target language code (default: en)")
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help="Worker processes")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=None, help="Translation backend (default: TRAYUE_BACKEND or google)")
+    parser.add_argument('--url', default=None, help="Override the backend's endpoint")
+    parser.add_argument('--rate', type=float, default=None, help="Requests per second across all workers (default: the backend's)")
+    parser.add_argument('--burst', type=int, default=None)
+    parser.add_argument('--in-flight', type=int, default=None, help="Concurrent requests per worker (default: the backend's)")
+    parser.add_argument('--batch-chars', type=int, default=DEFAULT_BATCH_CHARS, help="Characters per request, 0 for one row per request")
+    parser.add_argument('--memory', default=default_memory_path(), help="Translation memory database")
+    parser.add_argument('--no-memory', action='store_true')
+    parser.add_argument('--glossary', default=None, help="Glossary of term<TAB>translation lines (default: trayue's glossary.tsv if there is one)")
+    parser.add_argument('--no-glossary', action='store_true')
+    parser.add_argument('--overwrite', action='store_true', help="Translate files whose output already exists")
+    args = parser.parse_args(argv)
+
+    if args.source not in LANGUAGES or args.target not in LANGUAGES:
+        print(f"Warning: language codes outside {', '.join(LANGUAGES)} are passed to the backend as they are", file=sys.stderr)
+
+    inputs = find_inputs(args.inputs, args.target, args.recursive)
+    if not args.overwrite:
+        # A journal beside the output means an earlier run did not finish
+        skipped = [path for path in inputs
+                   if os.path.exists(translated_path(path, args.target)) and not os.path.exists(journal_path(path, args.target))]
+        for path in skipped:
+            print(f"Skipping {path}: {translated_path(path, args.target)} exists")
+        inputs = [path for path in inputs if path not in skipped]
+    if not inputs:
+        print("No subtitle files to translate.")
+        return 0
+
+    backend = create_backend(args.backend, args.url)
+    limiter = SharedTokenBucket(args.rate or backend.rate, args.burst or backend.burst)
+    memory_path = None if args.no_memory else args.memory
+    glossary_path = None if args.no_glossary else args.glossary or default_glossary_path()
+    if glossary_path and not os.path.exists(glossary_path):
+        if args.glossary:
+            print(f"Glossary not found: {glossary_path}", file=sys.stderr)
+            return 1
+        glossary_path = None
+    if glossary_path:
+        print(f"Using {len(Glossary.load(glossary_path))} glossary terms from {glossary_path}")
+    workers = max(1, min(args.workers, len(inputs)))
+    print(f"Translating {len(inputs)} files ({args.source} -> {args.target}) on {workers} workers "
+          f"at {limiter.rate:g} requests/s through {backend.name}")
+
+    totals = {'files': 0, 'rows': 0, 'chars': 0, 'failed': 0}
+    crashed = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(workers, initializer=init_worker,
+                             initargs=(backend.name, args.url, limiter, args.in_flight, memory_path, glossary_path)) as executor:
+        futures = {executor.submit(translate_file, path, args.source, args.target, args.batch_chars): path for path in inputs}
+        for future in as_completed(futures):
+            try:
+                stats = future.result()
+            except Exception as e:
+                crashed += 1
+                print(f"Failed {futures[future]}: {e}", file=sys.stderr)
+                continue
+            for key in ('rows', 'chars', 'failed'):
+                totals[key] += stats[key]
+            totals['files'] += 1
+            note = f", resumed {stats['resumed']} from the journal" if stats['resumed'] else ""
+            note += f", {stats['failed']} rows failed ({stats['error']})" if stats['failed'] else ""
+            print(f"{stats['output']}: {stats['rows']} rows in {stats['seconds']:.1f}s{note}")
+    elapsed = time.perf_counter() - started
+
+    print(f"Done: {totals['files']} files, {totals['rows']} rows, {totals['chars']} chars in {elapsed:.1f}s "
+          f"({totals['files'] / elapsed:.2f} files/s, {totals['rows'] / elapsed:.1f} rows/s, {totals['chars'] / elapsed:.0f} chars/s); "
+          f"{totals['failed']} rows failed, {crashed} files failed")
+    return 1 if crashed or totals['failed'] else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
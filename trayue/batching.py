@@ -0,0 +1,67 @@
+import re
+
+# Characters of subtitle text packed into one request. Google's gtx endpoint
+# takes the text in the query string, where each CJK character costs nine
+# bytes once percent-encoded, so this keeps URLs well under its limit.
+DEFAULT_BATCH_CHARS = 1000
+
+# Rows are sent as "[1] text\n[2] text\n...". Bracketed numbers come back
+# untouched, but the brackets are sometimes turned full-width or padded.
+MARKER_REGEX = re.compile(r'[\[［【]\s*(\d+)\s*[\]］】]\s?')
+
+
+def pack_batches(texts, max_chars=DEFAULT_BATCH_CHARS):
+    # Groups the indices of non-empty texts into runs of at most max_chars
+    # characters (markers included). A text longer than that goes on its own.
+    batches = []
+    batch = []
+    size = 0
+    for index, text in enumerate(texts):
+        if not text or not text.strip():
+            continue
+        cost = len(text) + len(str(len(batch) + 1)) + 4
+        if batch and size + cost > max_chars:
+            batches.append(batch)
+            batch = []
+            size = 0
+            cost = len(text) + 5
+        batch.append(index)
+        size += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def join_batch(texts):
+    return '\n'.join(f'[{number}] {text.strip()}' for number, text in enumerate(texts, 1))
+
+
+def split_batch(translated, count):
+    # Returns one translation per row, or None unless the markers came back
+    # exactly as 1..count in order with text between them.
+    parts = MARKER_REGEX.split(translated)
+    if parts[0].strip():
+        return None
+    numbers = parts[1::2]
+    bodies = parts[2::2]
+    if numbers != [str(number) for number in range(1, count + 1)]:
+        return None
+    rows = [body.strip() for body in bodies]
+    if not all(rows):
+        return None
+    return rows
+
+
+def translate_batch(texts, translate_func, source_lang, target_lang):
+    # Translates non-empty texts in one request and returns one translation
+    # per text. If the markers do not line up, falls back to a request per
+    # text. Errors are passed on as the "Error: ..." strings translate_func
+    # returns, one per row.
+    if len(texts) > 1:
+        translated = translate_func(join_batch(texts), source_lang, target_lang)
+        if translated.startswith("Error:"):
+            return [translated] * len(texts)
+        rows = split_batch(translated, len(texts))
+        if rows is not None:
+            return rows
+    return [translate_func(text, source_lang, target_lang) for text in texts]
@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from glossary import Glossary
+
+# Compares the glossary automaton with one str.replace per term over the same
+# subtitle text, for growing glossaries, and times building a glossary from
+# its file. Prints one JSON document.
+
+CHARACTERS = '阿強哥細佬旺角尖沙咀銅鑼灣嘢食飯茶餐廳老細講乜你我佢哋喺度嚟去睇見'
+
+
+def make_terms(count, rng):
+    terms = set()
+    while len(terms) < count:
+        terms.add(''.join(rng.choice(CHARACTERS) for _ in range(rng.randint(2, 5))))
+    return {term: f"Term{index}" for index, term in enumerate(sorted(terms))}
+
+
+def replace_each(entries, text):
+    # Longest terms first, the best a replace loop can do for overlaps
+    for term in sorted(entries, key=len, reverse=True):
+        text = text.replace(term, entries[term])
+    return text
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trayue's glossary substitution")
+    parser.add_argument('--terms', type=int, nargs='*', default=[100, 1000, 10000])
+    parser.add_argument('--chars', type=int, default=200000, help="Characters of subtitle text to rewrite")
+    parser.add_argument('--output', default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    text = ''.join(rng.choice(CHARACTERS) for _ in range(args.chars))
+    cases = []
+    for count in args.terms:
+        entries = make_terms(count, rng)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'glossary.tsv')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(''.join(f"{term}\t{translation}\n" for term, translation in entries.items()))
+            glossary, build_seconds = timed(Glossary.load, path)
+
+        _, automaton_seconds = timed(glossary.substitute, text)
+        _, replace_seconds = timed(replace_each, entries, text)
+        cases.append({
+            'terms': count,
+            'chars': len(text),
+            'automaton_seconds': round(automaton_seconds, 4),
+            'automaton_chars_per_sec': round(len(text) / automaton_seconds),
+            'replace_loop_seconds': round(replace_seconds, 4),
+            'build_seconds': round(build_seconds, 4),
+        })
+
+    output = json.dumps({'cases': cases}, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subtitle_reader import read_file, read_cues
+
+# Measures subtitle_reader against the regex parse_srt it replaced, on
+# generated multi-megabyte SRT (LF and CRLF) and WebVTT files. Prints one
+# JSON document with MB/s, cues/s and time to the first cue for each, and
+# streaming_vs_legacy, the streaming reader's SRT throughput over the regex's.
+
+LEGACY_PATTERN = r'(\d+)\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n((?:.*\n)*?)\n'
+
+LINES = ['佢話聽日會返嚟', '真係唔知點算好', '你喺邊度呀？\n我喺度等緊你', '我哋走啦']
+
+
+def timestamp(ms, separator):
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}{separator}{ms % 1000:03d}"
+
+
+def make_subtitles(cues, kind):
+    out = io.StringIO()
+    separator = '.' if kind == 'vtt' else ','
+    if kind == 'vtt':
+        out.write('WEBVTT\n\n')
+    for i in range(cues):
+        start = i * 2000
+        if kind != 'vtt':
+            out.write(f"{i + 1}\n")
+        out.write(f"{timestamp(start, separator)} --> {timestamp(start + 1800, separator)}\n{LINES[i % len(LINES)]}\n\n")
+    return out.getvalue()
+
+
+def legacy_parse(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        content = file.read()
+    return re.findall(LEGACY_PATTERN, content, re.MULTILINE)
+
+
+def run_case(name, path, parse, first_cue=None):
+    size = os.path.getsize(path)
+    started = time.perf_counter()
+    count = len(parse(path))
+    elapsed = time.perf_counter() - started
+    result = {
+        'case': name,
+        'megabytes': round(size / 1e6, 2),
+        'cues': count,
+        'seconds': round(elapsed, 4),
+        'mb_per_sec': round(size / 1e6 / elapsed, 1),
+        'cues_per_sec': round(count / elapsed),
+    }
+    if first_cue:
+        started = time.perf_counter()
+        first_cue(path)
+        result['first_cue_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trayue's streaming subtitle reader")
+    parser.add_argument('--cues', type=int, default=100000, help="Cues per generated file (100k is about 5 MB)")
+    parser.add_argument('--repeat', type=int, default=3, help="Best of this many runs per case")
+    parser.add_argument('--output', default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    streaming = lambda path: list(read_file(path))
+    first_cue = lambda path: next(read_file(path), None)
+
+    cases = []
+    with tempfile.TemporaryDirectory() as directory:
+        files = {}
+        for kind, newline in (('srt', '\n'), ('srt-crlf', '\r\n'), ('vtt', '\n')):
+            path = os.path.join(directory, f'sample.{kind}')
+            with open(path, 'w', encoding='utf-8', newline=newline) as file:
+                file.write(make_subtitles(args.cues, kind.split('-')[0]))
+            files[kind] = path
+
+        for kind, path in files.items():
+            runs = [('streaming', streaming, first_cue)]
+            if kind == 'srt':
+                # The regex only ever understood LF SRT
+                runs.append(('legacy_regex', legacy_parse, None))
+            # Runs alternate between readers so that both see the same machine
+            results = [[run_case(f'{name}:{kind}', path, parse, first) for name, parse, first in runs]
+                       for _ in range(args.repeat)]
+            cases.extend(min(rounds, key=lambda r: r['seconds']) for rounds in zip(*results))
+        # Throughput of the streaming reader as a share of the regex it replaced
+        speeds = {case['case']: case['mb_per_sec'] for case in cases}
+        parity = round(speeds['streaming:srt'] / speeds['legacy_regex:srt'], 2)
+
+        # Lines arriving one at a time, as from a pipe
+        with open(files['srt'], 'r', encoding='utf-8') as file:
+            lines = file.readlines()
+        started = time.perf_counter()
+        count = sum(1 for _ in read_cues(iter(lines)))
+        elapsed = time.perf_counter() - started
+        cases.append({'case': 'streaming:lines', 'cues': count, 'seconds': round(elapsed, 4), 'cues_per_sec': round(count / elapsed)})
+
+    output = json.dumps({'cues_per_file': args.cues, 'streaming_vs_legacy': parity, 'cases': cases}, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import MockBackend
+from engine import TranslationEngine
+from memory import TranslationMemory
+from mock_server import MockTranslateServer
+
+# Runs trayue's translation pipeline (TranslationEngine with batching and
+# dedup) against mock_server.py for a grid of batch sizes and in-flight
+# limits, and prints one JSON document with requests/sec, per-request
+# p50/p99 latency and rows/sec for each.
+
+PHRASES = ['嗯', '係呀', '唔該晒', '你喺邊度呀', '我哋走啦', '真係唔知點算好', '佢話聽日會返嚟']
+
+
+def make_rows(count, repeat_ratio, seed=1):
+    # repeat_ratio of the rows are stock phrases, the rest unique lines
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        if rng.random() < repeat_ratio:
+            rows.append(rng.choice(PHRASES))
+        else:
+            rows.append(f"第{i}句：{rng.choice(PHRASES)}，{rng.choice(PHRASES)}")
+    return rows
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_case(server, rows, batch_chars, max_in_flight, rate, use_memory):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def observer(seconds, error):
+        with lock:
+            latencies.append(seconds)
+            if error is not None:
+                errors.append(error)
+
+    memory = TranslationMemory(':memory:') if use_memory else None
+    engine = TranslationEngine(MockBackend(server.url), max_in_flight=max_in_flight, rate=rate, burst=max_in_flight,
+                               memory=memory, observer=observer)
+    results = {}
+    started = time.perf_counter()
+    failed = engine.translate_rows(rows, 'yue', 'en', results.__setitem__, batch_chars)
+    elapsed = time.perf_counter() - started
+    engine.close()
+
+    return {
+        'batch_chars': batch_chars,
+        'max_in_flight': max_in_flight,
+        'memory': use_memory,
+        'rows': len(rows),
+        'failed_rows': failed,
+        'requests': len(latencies),
+        'failed_attempts': len(errors),
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'rows_per_sec': round(len(rows) / elapsed, 1),
+        'latency_p50_ms': round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+        'latency_p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test trayue's translation pipeline against the mock server")
+    parser.add_argument('--rows', type=int, default=1500)
+    parser.add_argument('--repeat-ratio', type=float, default=0.3, help="Share of rows that are stock phrases")
+    parser.add_argument('--batch-chars', type=int, nargs='*', default=[0, 1000])
+    parser.add_argument('--in-flight', type=int, nargs='*', default=[1, 4, 8])
+    parser.add_argument('--rate', type=float, default=200.0, help="Client requests per second")
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--rate-limit', type=int, default=0, help="Server requests per second before 429s (0 = unlimited)")
+    parser.add_argument('--memory', action='store_true', help="Also dedupe through a fresh translation memory")
+    parser.add_argument('--output', default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    server = MockTranslateServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, rate_limit=args.rate_limit)
+    server.start()
+    rows = make_rows(args.rows, args.repeat_ratio)
+    cases = []
+    try:
+        for batch_chars in args.batch_chars:
+            for max_in_flight in args.in_flight:
+                cases.append(run_case(server, rows, batch_chars, max_in_flight, args.rate, args.memory))
+    finally:
+        server.shutdown()
+
+    output = json.dumps({
+        'server': {'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms, 'error_rate': args.error_rate, 'rate_limit': args.rate_limit},
+        'cases': cases,
+    }, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
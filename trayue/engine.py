@@ -0,0 +1,233 @@
+import multiprocessing
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from backends import BackendError, GoogleGtxBackend
+from batching import DEFAULT_BATCH_CHARS, pack_batches, translate_batch
+from memory import normalize
+
+DEFAULT_MAX_RETRIES = 4
+# Backoff before retry n is uniform in [0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** n)]
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+
+
+class TokenBucket:
+    # Allows `rate` acquisitions per second on average and bursts of up to
+    # `burst`. Shared by every thread of an engine.
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        # Takes a token and returns 0, or returns the seconds until one is due
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self, should_stop=None):
+        # Blocks until a token is free; returns False if should_stop() says so first
+        while True:
+            wait = self.take()
+            if not wait:
+                return True
+            if should_stop and should_stop():
+                return False
+            time.sleep(min(wait, 0.1))
+
+
+class SharedTokenBucket(TokenBucket):
+    # A TokenBucket kept in shared memory, so engines in several worker
+    # processes draw on one budget. Hand it to the workers when they start
+    # (Process args or a pool initializer); it cannot be pickled later.
+    # time.monotonic() is system-wide on the platforms we run on.
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.state = multiprocessing.Array('d', [self.capacity, time.monotonic()])
+
+    def take(self):
+        with self.state.get_lock():
+            tokens, updated = self.state[0], self.state[1]
+            now = time.monotonic()
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+            self.state[0] = tokens - 1 if not wait else tokens
+            self.state[1] = now
+            return wait
+
+
+class TranslationEngine:
+    # Translates subtitle rows through a TranslationBackend over one pooled
+    # keep-alive session, with at most max_in_flight requests at a time and
+    # a token-bucket rate limit (both default to the backend's). Retryable
+    # failures are retried with jittered exponential backoff. Like
+    # google_translate always did, failures come back as "Error: ..."
+    # strings rather than exceptions. An optional TranslationMemory serves
+    # and learns translations of whole rows. An optional Glossary rewrites
+    # its terms in every row before translation and in every result after.
+    # observer(seconds, error), if given, is told about every HTTP attempt.
+    def __init__(self, backend=None, max_in_flight=None, rate=None, burst=None,
+                 max_retries=DEFAULT_MAX_RETRIES, timeout=10, limiter=None, memory=None, observer=None, glossary=None):
+        self.backend = backend or GoogleGtxBackend()
+        self.memory = memory
+        self.glossary = glossary
+        self.observer = observer
+        self.max_in_flight = max(1, max_in_flight or self.backend.max_in_flight)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = limiter or TokenBucket(rate or self.backend.rate, burst or self.backend.burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.backend.prepare(self.session)
+
+    def translate(self, text, source_lang, target_lang, should_stop=None):
+        if not text or text.strip() == '':
+            return ''
+        error = None
+        retry_after = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.sleep_before_retry(attempt, retry_after)
+            if not self.limiter.acquire(should_stop):
+                return "Error: Translation stopped"
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                translated = self.backend.request(self.session, text, source_lang, target_lang, self.timeout)
+            except BackendError as e:
+                self.observe(started, e)
+                error = f"Error: {str(e)}"
+                if not e.retry:
+                    return error
+                retry_after = e.retry_after
+                continue
+            except requests.RequestException as e:
+                self.observe(started, e)
+                error = f"Error: {str(e)}"
+                continue
+            self.observe(started, None)
+            return translated
+        return error
+
+    def observe(self, started, error):
+        if self.observer:
+            self.observer(time.perf_counter() - started, error)
+
+    def sleep_before_retry(self, attempt, retry_after):
+        delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+        if retry_after:
+            delay = max(delay, min(BACKOFF_CAP, retry_after))
+        time.sleep(delay)
+
+    def translate_rows(self, texts, source_lang, target_lang, on_result, batch_chars=DEFAULT_BATCH_CHARS, should_stop=None):
+        # Calls on_result(index, translation) for every text as its request
+        # completes, in whatever order that is. With batch_chars 0 each row is
+        # a request of its own. Returns the number of rows that failed.
+        should_stop = should_stop or (lambda: False)
+        glossary = self.glossary
+        if not glossary:
+            return self.translate_texts(texts, source_lang, target_lang, on_result, batch_chars, should_stop)
+
+        # Glossary terms go out masked and come back as their translations.
+        # The memory keys on the text as sent, so a glossary change is a miss
+        # rather than a stale hit.
+        masked = [glossary.mask(text) for text in texts]
+        lost = []
+
+        def deliver(index, translation):
+            if translation.startswith("Error:"):
+                on_result(index, translation)
+                return
+            restored = glossary.restore(translation, masked[index][1])
+            if restored is None:
+                lost.append(index)
+            else:
+                on_result(index, restored)
+
+        failed = self.translate_texts([text for text, _ in masked], source_lang, target_lang, deliver, batch_chars, should_stop)
+        if not lost or should_stop():
+            return failed + len(lost)
+
+        # Rows whose placeholders did not survive are translated again as
+        # they are, with only the echoed terms swapped afterwards
+        def deliver_unmasked(position, translation):
+            on_result(lost[position], translation if translation.startswith("Error:") else glossary.substitute(translation))
+
+        return failed + self.translate_texts([texts[index] for index in lost], source_lang, target_lang, deliver_unmasked, batch_chars, should_stop)
+
+    def translate_texts(self, texts, source_lang, target_lang, on_result, batch_chars, should_stop):
+        # translate_rows without the glossary
+        def translate_func(text, source, target):
+            return self.translate(text, source, target, should_stop)
+
+        # Rows that normalize to the same text are requested once and fanned out
+        occurrences = {}
+        for index, text in enumerate(texts):
+            source = normalize(text) if text else ''
+            if source:
+                occurrences.setdefault(source, []).append(index)
+            else:
+                on_result(index, '')
+        sources = list(occurrences)
+
+        # The translation memory answers before anything goes over the network
+        if self.memory:
+            known = self.memory.get_many(sources, source_lang, target_lang)
+            for source, translation in known.items():
+                for index in occurrences[source]:
+                    on_result(index, translation)
+            sources = [source for source in sources if source not in known]
+
+        # Never more per request than the backend can split back up
+        batch_chars = min(batch_chars, self.backend.max_batch_chars)
+        if batch_chars:
+            batches = pack_batches(sources, batch_chars)
+        else:
+            batches = [[position] for position in range(len(sources))]
+
+        def run_batch(batch):
+            if should_stop():
+                return batch, None
+            return batch, translate_batch([sources[position] for position in batch], translate_func, source_lang, target_lang)
+
+        failed = 0
+        executor = ThreadPoolExecutor(self.max_in_flight)
+        try:
+            futures = [executor.submit(run_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                batch, translations = future.result()
+                if should_stop():
+                    break
+                learned = []
+                for position, translation in zip(batch, translations):
+                    indices = occurrences[sources[position]]
+                    if translation.startswith("Error:"):
+                        failed += len(indices)
+                    else:
+                        learned.append((sources[position], translation))
+                    for index in indices:
+                        on_result(index, translation)
+                if self.memory and learned:
+                    self.memory.put_many(learned, source_lang, target_lang)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        return failed
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,180 @@
+import os
+import re
+from collections import deque
+
+from memory import default_memory_path
+
+# What a term is masked as while it is translated. Services pass these
+# through as they are, give or take padding inside the brackets.
+PLACEHOLDER = '⟦{}⟧'
+PLACEHOLDER_REGEX = re.compile(r'⟦\s*(\d+)\s*⟧')
+
+
+def default_glossary_path():
+    return os.environ.get('TRAYUE_GLOSSARY') or os.path.join(os.path.dirname(default_memory_path()), 'glossary.tsv')
+
+
+def parse_glossary(content):
+    # One "term<TAB>translation" per line; blank lines and "#" comments are
+    # skipped, and a later line for the same term wins
+    entries = {}
+    for line in content.splitlines():
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        term, _, translation = line.partition('\t')
+        term = term.strip()
+        if term and translation.strip():
+            entries[term] = translation.strip()
+    return entries
+
+
+class Automaton:
+    # Aho-Corasick over the reversed terms. Running it right to left over a
+    # text gives, for every position, the longest term that starts there, in
+    # one pass whose cost depends on the text and not on how many terms
+    # there are. goto[state] maps a character to the next state, fail[state]
+    # is the longest proper suffix state, and term[state] is the index of the
+    # longest term the state's path ends with (-1 for none).
+    def __init__(self, terms):
+        self.goto = [{}]
+        self.fail = [0]
+        self.term = [-1]
+        self.lengths = [len(term) for term in terms]
+        for index, term in enumerate(terms):
+            state = 0
+            for char in reversed(term):
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.term.append(-1)
+                state = next_state
+            self.term[state] = index
+
+        # Breadth-first, so a state's fail target is finished before it
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                # Inherit a longer match through the fail link
+                inherited = self.term[self.fail[next_state]]
+                if inherited >= 0 and (self.term[next_state] < 0 or self.lengths[inherited] > self.lengths[self.term[next_state]]):
+                    self.term[next_state] = inherited
+
+    def longest_starts(self, text):
+        # [term index or -1] for each position of text
+        goto, fail, term = self.goto, self.fail, self.term
+        starts = [-1] * len(text)
+        state = 0
+        for position in range(len(text) - 1, -1, -1):
+            char = text[position]
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            starts[position] = term[state]
+        return starts
+
+    def find(self, text):
+        # Leftmost-longest, non-overlapping (start, end, term index) matches
+        if not self.lengths:
+            return []
+        starts = self.longest_starts(text)
+        matches = []
+        position = 0
+        while position < len(text):
+            index = starts[position]
+            if index >= 0:
+                end = position + self.lengths[index]
+                matches.append((position, end, index))
+                position = end
+            else:
+                position += 1
+        return matches
+
+
+class Glossary:
+    # Terms that must come out of translation the same way every time. Before
+    # translation each term is masked with an opaque placeholder, so the
+    # service carries it through instead of guessing; after translation each
+    # placeholder becomes the term's translation, and any term the service
+    # echoed back untranslated is swapped too.
+    def __init__(self, entries):
+        self.terms = list(entries)
+        self.translations = [entries[term] for term in self.terms]
+        self.automaton = Automaton(self.terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def substitute(self, text):
+        if not text or not self.terms:
+            return text
+        pieces = []
+        position = 0
+        for start, end, index in self.automaton.find(text):
+            pieces.append(text[position:start])
+            pieces.append(self.translations[index])
+            position = end
+        if not pieces:
+            return text
+        pieces.append(text[position:])
+        return ''.join(pieces)
+
+    def mask(self, text):
+        # (text with every term replaced by a placeholder, the term index
+        # behind each placeholder). Placeholders are numbered per text, so
+        # texts with the same terms mask the same way and still share memory
+        # entries and requests.
+        if not text or not self.terms:
+            return text, []
+        pieces = []
+        masked = []
+        position = 0
+        for start, end, index in self.automaton.find(text):
+            pieces.append(text[position:start])
+            pieces.append(PLACEHOLDER.format(len(masked)))
+            masked.append(index)
+            position = end
+        pieces.append(text[position:])
+        return ''.join(pieces), masked
+
+    def restore(self, translation, masked):
+        # translation with each placeholder swapped for its term's
+        # translation, or None if the service dropped, repeated or invented
+        # any of them
+        pieces = []
+        seen = set()
+        position = 0
+        for match in PLACEHOLDER_REGEX.finditer(translation):
+            number = int(match.group(1))
+            if number >= len(masked) or number in seen:
+                return None
+            seen.add(number)
+            pieces.append(self.substitute(translation[position:match.start()]))
+            pieces.append(self.translations[masked[number]])
+            position = match.end()
+        if len(seen) != len(masked):
+            return None
+        pieces.append(self.substitute(translation[position:]))
+        return ''.join(pieces)
+
+    @classmethod
+    def load(cls, path):
+        # Built afresh every time: even ten thousand terms compile in well
+        # under a tenth of a second
+        with open(path, 'r', encoding='utf-8-sig') as file:
+            return cls(parse_glossary(file.read()))
+
+
+def load_default_glossary():
+    # None when the user has no glossary yet
+    path = default_glossary_path()
+    return Glossary.load(path) if os.path.exists(path) else None
@@ -0,0 +1,115 @@
+import json
+import os
+import time
+
+from srt_output import translated_path, write_srt
+
+# Rows are fsynced at most this often; every append is flushed to the OS
+# at once, so only a power cut can lose the last second of them
+SYNC_INTERVAL = 1.0
+
+
+def journal_path(source_path, target_lang):
+    # episode.srt -> episode.en.srt.journal, beside the output it becomes
+    return translated_path(source_path, target_lang) + '.journal'
+
+
+class TranslationJournal:
+    # Append-only JSON lines sidecar of the rows translated so far for one
+    # subtitle file and language pair. A header line names the pair; every
+    # other line is {"row", "source", "text"}. Replaying keeps the last entry
+    # per row whose source still matches the file, and a torn final line from
+    # a crash is ignored.
+    def __init__(self, source_path, source_lang, target_lang, path=None):
+        self.source_path = source_path
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.path = path or journal_path(source_path, target_lang)
+        self.file = None
+        self.synced = 0.0
+
+    def header(self):
+        return {'journal': 1, 'source_lang': self.source_lang, 'target_lang': self.target_lang}
+
+    def replay(self, originals):
+        # {row: translation} from an earlier run, then opens for appending.
+        # A journal for another language pair starts over.
+        entries = {}
+        valid = False
+        torn = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                valid = json.loads(file.readline() or 'null') == self.header()
+                for line in file if valid else ():
+                    torn = not line.endswith('\n')
+                    try:
+                        entry = json.loads(line)
+                        row, source, text = entry['row'], entry['source'], entry['text']
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if 0 <= row < len(originals) and originals[row] == source:
+                        entries[row] = text
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            valid = False
+        self.open(append=valid)
+        if torn:
+            self.file.write('\n')
+        return entries
+
+    def open(self, append=True):
+        self.close()
+        self.file = open(self.path, 'a' if append else 'w', encoding='utf-8')
+        if not append:
+            self.write(self.header())
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+        now = time.monotonic()
+        if now - self.synced >= SYNC_INTERVAL:
+            os.fsync(self.file.fileno())
+            self.synced = now
+
+    def append(self, row, source, text):
+        if self.file is None:
+            self.open(append=os.path.exists(self.path))
+        self.write({'row': row, 'source': source, 'text': text})
+
+    def compact(self, rows, output_path=None):
+        # rows: (time_from, time_until, original, translation) for the whole
+        # file. Writes the output atomically; once every row is translated
+        # the journal has served its purpose and goes, otherwise it is
+        # rewritten down to one entry per row for the next resume.
+        rows = list(rows)
+        output_path = output_path or translated_path(self.source_path, self.target_lang)
+        write_srt(output_path, ((time_from, time_until, translation or original) for time_from, time_until, original, translation in rows))
+        self.close()
+        if all(translation or not original.strip() for _, _, original, translation in rows):
+            self.discard()
+            return output_path
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps(self.header(), ensure_ascii=False) + '\n')
+            for row, (_, _, original, translation) in enumerate(rows):
+                if translation:
+                    file.write(json.dumps({'row': row, 'source': original, 'text': translation}, ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        return output_path
+
+    def discard(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
@@ -0,0 +1,83 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# SQLite's default limit on bound parameters is 999
+LOOKUP_CHUNK = 500
+
+WHITESPACE_REGEX = re.compile(r'[^\S\n]+')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS memory (
+    source_lang TEXT NOT NULL,
+    target_lang TEXT NOT NULL,
+    source TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (source_lang, target_lang, source)
+) WITHOUT ROWID;
+'''
+
+
+def default_memory_path():
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'trayue', 'memory.sqlite3')
+
+
+def normalize(text):
+    # The memory key: NFKC (full-width punctuation and digits fold to their
+    # usual forms), runs of spaces collapsed, blank lines and the spaces
+    # around each line dropped. Line breaks inside a subtitle are kept.
+    text = unicodedata.normalize('NFKC', text)
+    lines = (WHITESPACE_REGEX.sub(' ', line).strip() for line in text.split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+class TranslationMemory:
+    # Translations already paid for, keyed on normalized source text and the
+    # language pair. Shared by all engine threads.
+    def __init__(self, path=None):
+        self.path = path or default_memory_path()
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+
+    def get_many(self, sources, source_lang, target_lang):
+        # {source: translation} for the normalized sources already known
+        sources = list(sources)
+        found = {}
+        with self.lock, self.conn:
+            for start in range(0, len(sources), LOOKUP_CHUNK):
+                chunk = sources[start:start + LOOKUP_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.conn.execute(
+                    f'SELECT source, translation FROM memory WHERE source_lang = ? AND target_lang = ? AND source IN ({placeholders})',
+                    (source_lang, target_lang, *chunk)).fetchall()
+                found.update(rows)
+                if rows:
+                    self.conn.execute(
+                        f'UPDATE memory SET hits = hits + 1 WHERE source_lang = ? AND target_lang = ? AND source IN ({placeholders})',
+                        (source_lang, target_lang, *chunk))
+        return found
+
+    def put_many(self, pairs, source_lang, target_lang):
+        # pairs: (normalized source, translation)
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT INTO memory (source_lang, target_lang, source, translation, updated_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (source_lang, target_lang, source) DO UPDATE SET translation = excluded.translation, updated_at = excluded.updated_at',
+                [(source_lang, target_lang, source, translation, now) for source, translation in pairs])
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,133 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for Google's gtx translate endpoint, for load tests. It
+# answers GET /translate_a/single with the same JSON shape, "translating"
+# each line by prefixing it with the target language while keeping batch
+# markers intact. Latency, random 429/5xx errors and a requests/second limit
+# are configurable. GET /stats returns request counters.
+
+MARKER_REGEX = re.compile(r'^(\[\d+\]\s?)?(.*)$')
+
+
+class MockTranslateServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency_ms=50, jitter_ms=20, error_rate=0.0, rate_limit=0):
+        super().__init__(address, MockTranslateHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.lock = threading.Lock()
+        self.window = []
+        self.stats = {'requests': 0, 'ok': 0, 'throttled': 0, 'errors': 0, 'characters': 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/translate_a/single"
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def throttled(self):
+        # Sliding one-second window of accepted requests
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            self.window = [started for started in self.window if now - started < 1.0]
+            if len(self.window) >= self.rate_limit:
+                return True
+            self.window.append(now)
+        return False
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def translate_text(text, target_lang):
+    lines = []
+    for line in text.split('\n'):
+        marker, body = MARKER_REGEX.match(line).groups()
+        lines.append(f"{marker or ''}{target_lang}:{body}" if body else line)
+    return '\n'.join(lines)
+
+
+class MockTranslateHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            with server.lock:
+                self.send_json(200, dict(server.stats))
+            return
+        if url.path != '/translate_a/single':
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        server.count('requests')
+        if server.throttled():
+            server.count('throttled')
+            self.send_json(429, {'error': 'rate limited'}, {'Retry-After': '1'})
+            return
+        delay = max(0.0, random.gauss(server.latency_ms, server.jitter_ms)) / 1000
+        time.sleep(delay)
+        if random.random() < server.error_rate:
+            server.count('errors')
+            self.send_json(random.choice((500, 503)), {'error': 'backend error'})
+            return
+
+        params = parse_qs(url.query)
+        text = params.get('q', [''])[0]
+        target_lang = params.get('tl', ['en'])[0]
+        server.count('ok')
+        server.count('characters', len(text))
+        # [[[translated, original, ...]], null, source language]
+        self.send_json(200, [[[translate_text(text, target_lang), text, None, None, 10]], None, params.get('sl', ['auto'])[0]])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the Google translate endpoint")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with a 500/503")
+    parser.add_argument('--rate-limit', type=int, default=0, help="Requests per second before answering 429 (0 = unlimited)")
+    args = parser.parse_args(argv)
+
+    server = MockTranslateServer((args.host, args.port), args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit)
+    print(f"Mock translate server at {server.url}")
+    print(f"Run trayue against it with TRAYUE_TRANSLATE_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
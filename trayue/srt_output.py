@@ -0,0 +1,33 @@
+import os
+import tempfile
+
+
+def translated_path(file_path, target_lang):
+    # episode.srt -> episode.en.srt, next to the original
+    directory, filename = os.path.split(file_path)
+    name, _ = os.path.splitext(filename)
+    return os.path.join(directory, f"{name}.{target_lang}.srt")
+
+
+def format_srt(rows):
+    # rows: (time_from, time_until, text), numbered from 1
+    return ''.join(f"{index}\n{time_from} --> {time_until}\n{text}\n\n" for index, (time_from, time_until, text) in enumerate(rows, 1))
+
+
+def write_srt(file_path, rows):
+    # Written to a temporary file beside the target and renamed over it, so
+    # a crash leaves either the old file or the new one, never half of one
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(file_path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(format_srt(rows))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
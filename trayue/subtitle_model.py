@@ -0,0 +1,151 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, QEvent, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionButton
+
+COLUMN_FROM = 0
+COLUMN_UNTIL = 1
+COLUMN_ORIGINAL = 2
+COLUMN_TRANSLATED = 3
+COLUMN_ACTION = 4
+HEADERS = ["Time From", "Time Until", "Original", "Translated", ""]
+
+# Translations arriving within this window are announced in one dataChanged
+UPDATE_INTERVAL_MS = 50
+
+
+class SubtitleModel(QAbstractTableModel):
+    # Subtitles held as one plain list per column. Views ask only for the
+    # cells they draw, so a 10k-row file costs four lists of strings rather
+    # than tens of thousands of items and widgets.
+    translation_edited = pyqtSignal(int, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.times_from = []
+        self.times_until = []
+        self.originals = []
+        self.translations = []
+        self.pending_rows = set()
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(UPDATE_INTERVAL_MS)
+        self.update_timer.timeout.connect(self.flush_updates)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.originals)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def column(self, column):
+        return (self.times_from, self.times_until, self.originals, self.translations)[column]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.column() == COLUMN_ACTION:
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole, Qt.ToolTipRole):
+            return self.column(index.column())[index.row()]
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid() or index.column() == COLUMN_ACTION:
+            return False
+        self.column(index.column())[index.row()] = value
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        if index.column() == COLUMN_TRANSLATED:
+            self.translation_edited.emit(index.row(), value)
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() != COLUMN_ACTION:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return str(section + 1)
+
+    def set_subtitles(self, subtitles):
+        # subtitles: (index, time_from, time_until, text) as parse_srt returns them
+        self.beginResetModel()
+        self.times_from = [subtitle[1] for subtitle in subtitles]
+        self.times_until = [subtitle[2] for subtitle in subtitles]
+        self.originals = [subtitle[3] for subtitle in subtitles]
+        self.translations = [''] * len(self.originals)
+        self.pending_rows.clear()
+        self.endResetModel()
+
+    def append_subtitles(self, subtitles):
+        if not subtitles:
+            return
+        first = len(self.originals)
+        self.beginInsertRows(QModelIndex(), first, first + len(subtitles) - 1)
+        self.times_from.extend(subtitle[1] for subtitle in subtitles)
+        self.times_until.extend(subtitle[2] for subtitle in subtitles)
+        self.originals.extend(subtitle[3] for subtitle in subtitles)
+        self.translations.extend([''] * len(subtitles))
+        self.endInsertRows()
+
+    def set_translation(self, row, text):
+        # Cheap enough to call once per translated row; views hear about the
+        # rows changed since the last tick in a single dataChanged
+        self.translations[row] = text
+        self.pending_rows.add(row)
+        if not self.update_timer.isActive():
+            self.update_timer.start()
+
+    def flush_updates(self):
+        if not self.pending_rows:
+            return
+        first = min(self.pending_rows)
+        last = max(self.pending_rows)
+        self.pending_rows.clear()
+        self.dataChanged.emit(self.index(first, COLUMN_TRANSLATED), self.index(last, COLUMN_TRANSLATED), [Qt.DisplayRole])
+
+    def untranslated(self, rows=None):
+        # (rows, texts) still without a translation, optionally within rows
+        rows = range(len(self.originals)) if rows is None else rows
+        pending = [row for row in rows if not self.translations[row]]
+        return pending, [self.originals[row] for row in pending]
+
+
+class TranslateButtonDelegate(QStyledItemDelegate):
+    # Paints a "Translate" push button in each cell of its column without
+    # creating a widget per row, and reports clicks as clicked(row).
+    clicked = pyqtSignal(int)
+
+    def __init__(self, text='Translate', parent=None):
+        super().__init__(parent)
+        self.text = text
+        self.pressed_row = None
+
+    def button_option(self, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = self.text
+        button.state = QStyle.State_Enabled
+        if self.pressed_row == index.row():
+            button.state |= QStyle.State_Sunken
+        else:
+            button.state |= QStyle.State_Raised
+        return button
+
+    def paint(self, painter, option, index):
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, self.button_option(option, index), painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonPress and option.rect.contains(event.pos()):
+            self.pressed_row = index.row()
+            return True
+        if event.type() == QEvent.MouseButtonRelease:
+            pressed, self.pressed_row = self.pressed_row, None
+            if pressed == index.row() and option.rect.contains(event.pos()):
+                self.clicked.emit(index.row())
+            return True
+        return False
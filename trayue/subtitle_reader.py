@@ -0,0 +1,150 @@
+import re
+
+# Streaming SRT/WebVTT reader. Text comes in as chunks (a file's reads or
+# lines, a pipe...) and is cut at its last blank line into a run of complete
+# blocks, which one regex scan turns into cues; so cues come out as soon as
+# their chunk is read and a file of any size never has to be held in memory.
+# Cues are (index, time_from, time_until, text) like parse_srt always
+# returned, with times in SRT form.
+
+READ_CHUNK_CHARS = 1 << 16
+
+# One or more blank lines, which may hold spaces
+BLANK_LINES_REGEX = re.compile(r'\n(?:[ \t]*\n)+')
+SRT_TIME = r'\d\d:\d\d:\d\d,\d\d\d'
+SRT_TIME_REGEX = re.compile(SRT_TIME + '$')
+TIME = r'((?:\d+:)?\d{1,2}:\d{2}[,.]\d{1,3})'
+# One block of a run whose blank lines are all bare "\n\n", with the blank
+# lines after it: a cue (an optional identifier line, the timing line, where
+# WebVTT settings after the times are ignored, and the text) or, failing
+# that, any other block, matched with empty groups. Every match ends where
+# the next block starts, so one scan walks the run block by block.
+BLOCKS_REGEX = re.compile(r'\n*(?:(?:(.*)\n)?[ \t]*' + TIME + r'[ \t]*-->[ \t]*' + TIME
+                          + r'.*(?:\n(.+(?:\n.+)*))?|.+(?:\n.+)*)\n*')
+# A whole block holding a cue as a sensible SRT writer puts it, which needs
+# no fixing up; a run made only of these is scanned with it, at about twice
+# the speed. The lookbehinds keep a match from starting partway into a block.
+SRT_CUES_REGEX = re.compile(r'\n*(?<![^\n])(?<![^\n]\n)(\d+)\n(' + SRT_TIME + ') --> (' + SRT_TIME
+                            + r')\n(.+(?:\n.+)*)')
+
+# WebVTT blocks that carry no cue
+VTT_SKIP_BLOCKS = ('WEBVTT', 'NOTE', 'STYLE', 'REGION')
+
+
+def srt_time(timestamp):
+    # "1:02.5", "00:01:02.500" and "00:01:02,500" all become "00:01:02,500"
+    if SRT_TIME_REGEX.match(timestamp):
+        return timestamp
+    if len(timestamp) == 12 and timestamp[8] == '.':
+        return timestamp[:8] + ',' + timestamp[9:]
+    clock, _, fraction = timestamp.replace(',', '.').partition('.')
+    parts = clock.split(':')
+    if len(parts) == 2:
+        parts.insert(0, '0')
+    hours, minutes, seconds = parts
+    return f"{int(hours):02d}:{int(minutes):02d}:{int(seconds):02d},{fraction.ljust(3, '0')[:3]}"
+
+
+def is_srt_run(region, cues):
+    # Whether SRT_CUES_REGEX matched every block of region. Each match is one
+    # whole block, so it did when there are as many matches as blocks; a run
+    # of three or more line breaks can only make the count of those larger.
+    blocks = region.count('\n\n') + 1 - region.startswith('\n\n') - region.endswith('\n\n')
+    return len(cues) == blocks
+
+
+def read_regions(chunks):
+    # Runs of complete blocks, with every blank line a bare "\n\n". The
+    # unfinished block is kept as pieces and only its tail, from the last line
+    # break on, is searched again with the next chunk, so input with no blank
+    # lines (or one enormous cue) still reads in linear time.
+    pieces = []
+    tail = ''
+    held = ''
+    first = True
+    for chunk in chunks:
+        if first:
+            chunk = chunk.lstrip('\ufeff')
+            first = False
+        chunk = held + chunk
+        # Hold back a trailing CR until we know whether an LF follows it
+        held = ''
+        if chunk.endswith('\r'):
+            chunk, held = chunk[:-1], '\r'
+        if '\r' in chunk:
+            chunk = chunk.replace('\r\n', '\n').replace('\r', '\n')
+        data = tail + chunk
+        # Blank lines holding spaces are rare; only then is a pass needed. Any
+        # tab will do, as looking for one character is far quicker than two.
+        if '\t' in data or '\n ' in data:
+            data = BLANK_LINES_REGEX.sub('\n\n', data)
+        cut = data.rfind('\n\n')
+        if cut >= 0:
+            pieces.append(data[:cut])
+            yield ''.join(pieces)
+            pieces = []
+            data = data[cut:]
+        # A blank line can only start at the last line break, and only if
+        # nothing but spaces follows it
+        newline = data.rfind('\n')
+        if newline >= 0 and not data[newline + 1:].strip(' \t'):
+            pieces.append(data[:newline])
+            tail = data[newline:]
+        else:
+            pieces.append(data)
+            tail = ''
+    # Files often end without the final blank line
+    yield ''.join(pieces) + BLANK_LINES_REGEX.sub('\n\n', (tail + held).replace('\r', '\n'))
+
+
+def read_cues(chunks):
+    # chunks: any iterable of text, with blocks and even lines split across
+    # chunk boundaries anywhere
+    count = 0
+    # Cleared once a run holds no plain SRT cue at all, so WebVTT and the like
+    # are not scanned twice
+    plain = True
+    for region in read_regions(chunks):
+        if plain:
+            cues = SRT_CUES_REGEX.findall(region)
+            if cues and is_srt_run(region, cues):
+                count += len(cues)
+                yield from cues
+                continue
+            plain = bool(cues) or not region.strip('\n')
+        blocks = BLOCKS_REGEX.findall(region)
+        cues = []
+        for identifier, time_from, time_until, text in blocks:
+            if not time_from:
+                continue
+            if not identifier.isdigit():
+                if identifier.startswith(VTT_SKIP_BLOCKS):
+                    continue
+                identifier = identifier.strip()
+                if not identifier.isdigit():
+                    identifier = str(count + 1)
+            count += 1
+            cues.append((identifier, srt_time(time_from), srt_time(time_until), text))
+        yield from cues
+
+
+def read_file(path, chunk_chars=READ_CHUNK_CHARS):
+    # utf-8-sig drops a BOM and universal newlines fold CRLF
+    with open(path, 'r', encoding='utf-8-sig') as file:
+        yield from read_cues(iter(lambda: file.read(chunk_chars), ''))
+
+
+def parse_subtitles(content):
+    return list(read_cues([content]))
+
+
+def read_batches(cues, size=500):
+    # Groups a cue stream into lists, for handing to a view a chunk at a time
+    batch = []
+    for cue in cues:
+        batch.append(cue)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -1,34 +1,48 @@
 import sys
-import re
-import requests
-import json
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QFileDialog, QHBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView, QMessageBox
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QFileDialog, QHBoxLayout, QTableView, QHeaderView, QMessageBox, QCheckBox, QSpinBox, QComboBox
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 
+from batching import DEFAULT_BATCH_CHARS
+from backends import LANGUAGES, create_backend
+from engine import TranslationEngine
+from memory import TranslationMemory
+from subtitle_model import SubtitleModel, TranslateButtonDelegate, COLUMN_ACTION
+from subtitle_reader import read_file, read_batches, parse_subtitles
+from srt_output import translated_path, write_srt
+from journal import TranslationJournal
+from glossary import Glossary, load_default_glossary
+
 class TranslatorThread(QThread):
     update_signal = pyqtSignal(int, str)
     error_signal = pyqtSignal(str)
     finished_signal = pyqtSignal()
     
-    def __init__(self, rows, texts, source_lang, target_lang, translate_func):
+    # batch_chars > 0 packs rows into requests of up to that many characters
+    def __init__(self, rows, texts, source_lang, target_lang, engine, batch_chars=0):
         QThread.__init__(self)
         self.rows = rows
         self.texts = texts
         self.source_lang = source_lang
         self.target_lang = target_lang
-        self.translate_func = translate_func
+        self.engine = engine
+        self.batch_chars = batch_chars
         self.stop_flag = False
 
     def run(self):
+        # Rows arrive as their requests complete; a failed row is reported
+        # at the end instead of aborting the others
+        errors = []
+
+        def on_result(index, translated_text):
+            if translated_text.startswith("Error:"):
+                errors.append(translated_text)
+            else:
+                self.update_signal.emit(self.rows[index], translated_text)
+
         try:
-            for row, text in zip(self.rows, self.texts):
-                if self.stop_flag:
-                    break
-                translated_text = self.translate_func(text, self.source_lang, self.target_lang)
-                if translated_text.startswith("Error:"):
-                    self.error_signal.emit(translated_text)
-                    return
-                self.update_signal.emit(row, translated_text)
+            self.engine.translate_rows(self.texts, self.source_lang, self.target_lang, on_result, self.batch_chars, lambda: self.stop_flag)
+            if errors and not self.stop_flag:
+                self.error_signal.emit(f"Error: {len(errors)} lines could not be translated. {errors[0]}")
         except Exception as e:
             self.error_signal.emit(f"Error: {str(e)}")
         finally:
@@ -37,13 +51,34 @@ class TranslatorThread(QThread):
     def stop(self):
         self.stop_flag = True
         
+class SubtitleLoaderThread(QThread):
+    # Streams cues off disk in chunks so the table fills while a long file
+    # is still being read
+    cues_signal = pyqtSignal(list)
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, file_path):
+        QThread.__init__(self)
+        self.file_path = file_path
+
+    def run(self):
+        try:
+            for batch in read_batches(read_file(self.file_path)):
+                self.cues_signal.emit(batch)
+        except Exception as e:
+            self.error_signal.emit(f"Error: could not read {self.file_path}: {str(e)}")
+
 class TranslatorApp(QWidget):
     def __init__(self):
         super().__init__()
+        self.current_file_path = None
+        self.translate_thread = None
+        self.load_thread = None
+        self.journal = None
+        self.engine = TranslationEngine(create_backend(), memory=TranslationMemory(), glossary=self.load_glossary())
         self.initUI()
 
     def initUI(self):
-        self.setWindowTitle('SRT Translator (Cantonese to English)')
         self.setGeometry(100, 100, 1000, 600)
 
         layout = QVBoxLayout()
@@ -55,13 +90,41 @@ class TranslatorApp(QWidget):
         self.selectFileBtn = QPushButton('Select SRT File')
         self.selectFileBtn.clicked.connect(self.select_file)
         file_layout.addWidget(self.selectFileBtn)
+        self.glossaryBtn = QPushButton(self.glossary_label())
+        self.glossaryBtn.clicked.connect(self.select_glossary)
+        file_layout.addWidget(self.glossaryBtn)
         layout.addLayout(file_layout)
 
+        # Language pair
+        language_layout = QHBoxLayout()
+        self.sourceLangCombo = QComboBox()
+        self.targetLangCombo = QComboBox()
+        for code, name in LANGUAGES.items():
+            self.sourceLangCombo.addItem(f"{name} ({code})", code)
+            self.targetLangCombo.addItem(f"{name} ({code})", code)
+        self.sourceLangCombo.setCurrentIndex(self.sourceLangCombo.findData('yue'))
+        self.targetLangCombo.setCurrentIndex(self.targetLangCombo.findData('en'))
+        self.sourceLangCombo.currentIndexChanged.connect(self.update_title)
+        self.targetLangCombo.currentIndexChanged.connect(self.update_title)
+        language_layout.addWidget(QLabel("From"))
+        language_layout.addWidget(self.sourceLangCombo)
+        language_layout.addWidget(QLabel("To"))
+        language_layout.addWidget(self.targetLangCombo)
+        language_layout.addStretch()
+        layout.addLayout(language_layout)
+        self.update_title()
+
         # Subtitle table
-        self.subtitleTable = QTableWidget()
-        self.subtitleTable.setColumnCount(5)
-        self.subtitleTable.setHorizontalHeaderLabels(["Time From", "Time Until", "Original", "Translated", ""])
+        self.subtitleModel = SubtitleModel(self)
+        self.subtitleTable = QTableView()
+        self.subtitleTable.setModel(self.subtitleModel)
+        self.subtitleModel.translation_edited.connect(self.journal_translation)
         self.subtitleTable.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        # Fixed row heights keep scrolling cheap however many rows there are
+        self.subtitleTable.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.translateButtonDelegate = TranslateButtonDelegate(parent=self.subtitleTable)
+        self.translateButtonDelegate.clicked.connect(self.translate_row)
+        self.subtitleTable.setItemDelegateForColumn(COLUMN_ACTION, self.translateButtonDelegate)
         layout.addWidget(self.subtitleTable)
 
         # Buttons layout
@@ -83,6 +146,18 @@ class TranslatorApp(QWidget):
         self.stopBtn.setEnabled(False)  # Disable the button initially
         button_layout.addWidget(self.stopBtn)
 
+        # Batching: many rows per request, up to a character budget
+        self.batchCheckBox = QCheckBox('Batch requests')
+        self.batchCheckBox.setChecked(True)
+        button_layout.addWidget(self.batchCheckBox)
+        self.batchCharsSpinBox = QSpinBox()
+        self.batchCharsSpinBox.setRange(100, 5000)
+        self.batchCharsSpinBox.setSingleStep(100)
+        self.batchCharsSpinBox.setValue(DEFAULT_BATCH_CHARS)
+        self.batchCharsSpinBox.setSuffix(' chars')
+        self.batchCheckBox.toggled.connect(self.batchCharsSpinBox.setEnabled)
+        button_layout.addWidget(self.batchCharsSpinBox)
+
         # Save button
         self.saveBtn = QPushButton('Save Translated SRT')
         self.saveBtn.clicked.connect(self.save_translated_srt)
@@ -93,86 +168,113 @@ class TranslatorApp(QWidget):
         self.setLayout(layout)
 
     def select_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "Select SRT File", "", "SRT Files (*.srt)")
+        file_path, _ = QFileDialog.getOpenFileName(self, "Select SRT File", "", "Subtitle Files (*.srt *.vtt);;SRT Files (*.srt);;WebVTT Files (*.vtt)")
         if file_path:
             self.current_file_path = file_path
             self.filePathLabel.setText(file_path)
-            with open(file_path, 'r', encoding='utf-8') as file:
-                srt_content = file.read()
-            self.load_subtitles(srt_content)
+            self.load_file(file_path)
+
+    def load_glossary(self, file_path=None):
+        try:
+            return Glossary.load(file_path) if file_path else load_default_glossary()
+        except (OSError, UnicodeDecodeError) as e:
+            QMessageBox.warning(self, "Warning", f"Could not load the glossary: {str(e)}")
+            return None
+
+    def glossary_label(self):
+        glossary = self.engine.glossary
+        return f"Glossary ({len(glossary)} terms)" if glossary else "Load Glossary"
+
+    def select_glossary(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Select Glossary", "", "Glossary Files (*.tsv *.txt)")
+        if file_path:
+            glossary = self.load_glossary(file_path)
+            if glossary:
+                self.engine.glossary = glossary
+                self.glossaryBtn.setText(self.glossary_label())
+
+    def load_file(self, file_path):
+        if self.load_thread and self.load_thread.isRunning():
+            self.load_thread.disconnect()
+            self.load_thread.wait()
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+        self.subtitleModel.set_subtitles([])
+        self.load_thread = SubtitleLoaderThread(file_path)
+        self.load_thread.cues_signal.connect(self.subtitleModel.append_subtitles)
+        self.load_thread.error_signal.connect(self.show_error_message)
+        self.load_thread.finished.connect(self.resume_from_journal)
+        self.load_thread.start()
+
+    def resume_from_journal(self):
+        # Rows translated before a crash or a stop come back from the sidecar
+        # journal, so only the rest is requested again
+        entries = self.open_journal()
+        for row, translated_text in entries.items():
+            self.subtitleModel.set_translation(row, translated_text)
+        if entries:
+            self.filePathLabel.setText(f"{self.current_file_path} (resumed {len(entries)} translated lines)")
+
+    def open_journal(self):
+        self.journal = TranslationJournal(self.current_file_path, self.source_lang(), self.target_lang())
+        try:
+            return self.journal.replay(self.subtitleModel.originals)
+        except OSError as e:
+            self.journal = None
+            self.show_error_message(f"Error: could not open the translation journal: {str(e)}")
+            return {}
+
+    def journal_translation(self, row, translated_text):
+        if not self.current_file_path:
+            return
+        # The journal belongs to one language pair; switching pairs starts another
+        if self.journal is None or (self.journal.source_lang, self.journal.target_lang) != (self.source_lang(), self.target_lang()):
+            self.open_journal()
+        if self.journal:
+            self.journal.append(row, self.subtitleModel.originals[row], translated_text)
 
     def load_subtitles(self, srt_content):
-        subtitles = self.parse_srt(srt_content)
-        self.subtitleTable.setRowCount(len(subtitles))
-        for row, (index, time_from, time_until, text) in enumerate(subtitles):
-            self.subtitleTable.setItem(row, 0, QTableWidgetItem(time_from))
-            self.subtitleTable.setItem(row, 1, QTableWidgetItem(time_until))
-            self.subtitleTable.setItem(row, 2, QTableWidgetItem(text))
-            self.subtitleTable.setItem(row, 3, QTableWidgetItem(""))
-            
-            translateBtn = QPushButton('Translate')
-            translateBtn.clicked.connect(lambda _, r=row: self.translate_row(r))
-            self.subtitleTable.setCellWidget(row, 4, translateBtn)
+        self.subtitleModel.set_subtitles(self.parse_srt(srt_content))
 
     def parse_srt(self, srt_content):
-        pattern = r'(\d+)\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n((?:.*\n)*?)\n'
-        return re.findall(pattern, srt_content, re.MULTILINE)
+        return parse_subtitles(srt_content)
 
     def translate_row(self, row):
-        original_text = self.subtitleTable.item(row, 2).text()
-        translated_text = self.google_translate(original_text, 'yue', 'en')
-        self.subtitleTable.setItem(row, 3, QTableWidgetItem(translated_text))
+        original_text = self.subtitleModel.originals[row]
+        translated_text = self.google_translate(original_text, self.source_lang(), self.target_lang())
+        self.update_translation(row, translated_text)
 
     def google_translate(self, text, source_lang, target_lang):
-        if not text or text.strip() == '':
-            return ''
-        try:
-            url = "https://translate.googleapis.com/translate_a/single"
-            params = {
-                "client": "gtx",
-                "sl": source_lang,
-                "tl": target_lang,
-                "dt": "t",
-                "q": text
-            }
-            
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            }
-            
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                result = json.loads(response.text)
-                translated_text = ''.join([sentence[0] for sentence in result[0]])
-                return translated_text
-            else:
-                return f"Error: Translation request failed with status code: {response.status_code}"
-        except requests.RequestException as e:
-            return f"Error: {str(e)}"
-        except json.JSONDecodeError:
-            return "Error: Failed to decode JSON response"
-        except Exception as e:
-            return f"Error: {str(e)}"
+        # One row through the same path as the batches, glossary and memory included
+        results = {}
+        self.engine.translate_rows([text], source_lang, target_lang, results.__setitem__, 0)
+        return results.get(0, '')
+
+    def source_lang(self):
+        return self.sourceLangCombo.currentData()
+
+    def target_lang(self):
+        return self.targetLangCombo.currentData()
+
+    def update_title(self):
+        self.setWindowTitle(f'SRT Translator ({LANGUAGES[self.source_lang()]} to {LANGUAGES[self.target_lang()]})')
+
+    def batch_chars(self):
+        return self.batchCharsSpinBox.value() if self.batchCheckBox.isChecked() else 0
 
     def translate_all(self):
         if not self.current_file_path:
             QMessageBox.warning(self, "Warning", "Please select an SRT file first.")
             return
 
-        rows = []
-        texts = []
-        for row in range(self.subtitleTable.rowCount()):
-            translated_text = self.subtitleTable.item(row, 3).text()
-            if not translated_text:  # Check if the translation is empty
-                rows.append(row)
-                texts.append(self.subtitleTable.item(row, 2).text())
-        
+        rows, texts = self.subtitleModel.untranslated()
+
         if not texts:
             QMessageBox.information(self, "Information", "All lines have already been translated.")
             return
 
-        self.translate_thread = TranslatorThread(rows, texts, 'yue', 'en', self.google_translate)
+        self.translate_thread = TranslatorThread(rows, texts, self.source_lang(), self.target_lang(), self.engine, self.batch_chars())
         self.translate_thread.update_signal.connect(self.update_translation)
         self.translate_thread.error_signal.connect(self.show_error_message)
         self.translate_thread.finished_signal.connect(self.translation_finished)
@@ -184,25 +286,18 @@ class TranslatorApp(QWidget):
         self.stopBtn.setEnabled(True)
 
     def block_translate(self):
-        selected_ranges = self.subtitleTable.selectedRanges()
-        if not selected_ranges:
+        selected_rows = sorted({index.row() for index in self.subtitleTable.selectionModel().selectedIndexes()})
+        if not selected_rows:
             QMessageBox.warning(self, "Warning", "Please select a range of subtitles to translate.")
             return
-        
-        rows = []
-        texts = []
-        for range_ in selected_ranges:
-            for row in range(range_.topRow(), range_.bottomRow() + 1):
-                translated_text = self.subtitleTable.item(row, 3).text()
-                if not translated_text:  # Check if the translation is empty
-                    rows.append(row)
-                    texts.append(self.subtitleTable.item(row, 2).text())
-        
+
+        rows, texts = self.subtitleModel.untranslated(selected_rows)
+
         if not texts:
             QMessageBox.information(self, "Information", "All selected lines have already been translated.")
             return
 
-        self.translate_thread = TranslatorThread(rows, texts, 'yue', 'en', self.google_translate)
+        self.translate_thread = TranslatorThread(rows, texts, self.source_lang(), self.target_lang(), self.engine, self.batch_chars())
         self.translate_thread.update_signal.connect(self.update_translation)
         self.translate_thread.error_signal.connect(self.show_error_message)
         self.translate_thread.finished_signal.connect(self.translation_finished)
@@ -232,26 +327,24 @@ class TranslatorApp(QWidget):
     def save_translated_srt(self, auto_save=False):
         if auto_save:
             if self.current_file_path:
-                directory, filename = os.path.split(self.current_file_path)
-                name, _ = os.path.splitext(filename)
-                new_filename = f"{name}.en.srt"
-                file_path = os.path.join(directory, new_filename)
+                file_path = translated_path(self.current_file_path, self.target_lang())
             else:
                 QMessageBox.warning(self, "Warning", "No file was selected. Cannot auto-save.")
                 return
         else:
             file_path, _ = QFileDialog.getSaveFileName(self, "Save Translated SRT", "", "SRT Files (*.srt)")
         
-        if file_path:
-            with open(file_path, 'w', encoding='utf-8') as file:
-                for row in range(self.subtitleTable.rowCount()):
-                    index = str(row + 1)
-                    time_from = self.subtitleTable.item(row, 0).text()
-                    time_until = self.subtitleTable.item(row, 1).text()
-                    translated_text = self.subtitleTable.item(row, 3).text()
-                    if not translated_text:
-                        translated_text = self.subtitleTable.item(row, 2).text()  # Use original if not translated
-                    file.write(f"{index}\n{time_from} --> {time_until}\n{translated_text}\n\n")
+        if auto_save and self.journal:
+            # Compacted from the journal: output written atomically, and the
+            # journal dropped once nothing is left to resume
+            model = self.subtitleModel
+            self.journal.compact(zip(model.times_from, model.times_until, model.originals, model.translations), file_path)
+            self.journal = None
+        elif file_path:
+            model = self.subtitleModel
+            # Use original if not translated
+            write_srt(file_path, zip(model.times_from, model.times_until,
+                                     (translated or original for translated, original in zip(model.translations, model.originals))))
             
             if not auto_save:
                 QMessageBox.information(self, "Information", f"File saved successfully as {file_path}")
@@ -260,7 +353,14 @@ class TranslatorApp(QWidget):
         QMessageBox.critical(self, "Error", error_message)
 
     def update_translation(self, row, translated_text):
-        self.subtitleTable.setItem(row, 3, QTableWidgetItem(translated_text))
+        self.subtitleModel.set_translation(row, translated_text)
+        if not translated_text.startswith("Error:"):
+            self.journal_translation(row, translated_text)
+
+    def closeEvent(self, event):
+        if self.journal:
+            self.journal.close()
+        super().closeEvent(event)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)